@@ -3,15 +3,28 @@
 from brs_libs.rpCache import rpCache
 from brs_libs.rpCache import add_arguments as rpCache_add_args
 from argparse import ArgumentParser as argparse_ArgParser
+from logging  import basicConfig, WARNING as logging_WARNING
+from sys      import exit as sys_exit
 
 
 def gen_cache(outdir):
     rpCache.generate_cache(outdir)
-    exit(0)
+    sys_exit(0)
 
 
 def _cli():
-    pass
+    basicConfig(
+        level=logging_WARNING,
+        format='%(asctime)s.%(msecs)03d %(levelname)s %(module)s - %(funcName)s: %(message)s',
+        datefmt='%d-%m-%Y %H:%M:%S',
+    )
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.cache_dir:
+        print("rpCache is going to be generated into " + args.cache_dir)
+        gen_cache(args.cache_dir)
+    else:
+        parser.print_help()
 
 
 def _add_arguments(parser):
@@ -26,10 +39,4 @@ def build_parser():
 
 
 if __name__ == '__main__':
-    parser = build_parser()
-    args = parser.parse_args()
-    if args.cache_dir:
-        print("rpCache is going to be generated into " + args.cache_dir)
-        gen_cache(args.cache_dir)
-    else:
-        _cli()
+    _cli()
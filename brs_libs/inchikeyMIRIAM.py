@@ -2,15 +2,9 @@
 
 from brs_libs import rpSBML
 from libsbml  import writeSBMLToFile
-from logging  import basicConfig, ERROR as logging_ERROR, getLogger
+from logging  import getLogger
 from brs_libs import rpCache
 
-basicConfig(
-    level=logging_ERROR,
-    format='%(asctime)s.%(msecs)03d %(levelname)s %(module)s - %(funcName)s: %(message)s',
-    datefmt='%d-%m-%Y %H:%M:%S',
-)
-
 
 class inchikeyMIRIAM:
     """This class holds the cache information used by the scripts
@@ -15,7 +15,6 @@ from redis      import StrictRedis
 from credisdict import CRedisDict, wait_for_redis
 from argparse   import ArgumentParser as argparse_ArgParser
 from hashlib    import sha512
-from pathlib    import Path
 from colored    import attr as c_attr
 
 
@@ -458,11 +457,21 @@ class rpCache:
             print_OK()
 
 
+    @staticmethod
+    def _file_sha512(filename, block_size=2<<20):
+        # hash the file by blocks instead of reading it whole in memory
+        h = sha512()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                h.update(block)
+        return h.hexdigest()
+
+
     @staticmethod
     def _check_or_download_cache_to_disk(cache_dir, attributes):
         for attr in attributes:
             filename = attr+rpCache._ext
-            if os_path.isfile(cache_dir+filename) and sha512(Path(cache_dir+filename).read_bytes()).hexdigest()==rpCache._cache_files[filename]:
+            if os_path.isfile(cache_dir+filename) and rpCache._file_sha512(cache_dir+filename)==rpCache._cache_files[filename]:
                 print(filename+" already downloaded ", end = '', flush=True)
                 print_OK()
             else:
@@ -580,7 +589,8 @@ class rpCache:
             fp = gzip_open(filename, 'rt', encoding='ascii')
         else:
             fp = open(filename, 'r')
-        return json_load(fp)
+        with fp:
+            return json_load(fp)
 
     ## Method to store data into file
     #
@@ -595,7 +605,9 @@ class rpCache:
             fp = gzip_open(filename, 'wt', encoding='ascii')
         else:
             fp = open(filename, 'w')
-        json_dump(data, fp)
+        # close the file so that the gzip stream is finished and flushed once
+        with fp:
+            json_dump(data, fp)
 
     ## Method to store data into redis database
     #
@@ -1,5 +1,4 @@
 import networkx as nx
-from networkx.readwrite import json_graph
 import logging
 import os
 import itertools
@@ -7,11 +6,17 @@ import numpy as np
 import random
 
 
-logging.basicConfig(
-    level=logging.ERROR,
-    format='%(asctime)s.%(msecs)03d %(levelname)s %(module)s - %(funcName)s: %(message)s',
-    datefmt='%d-%m-%Y %H:%M:%S',
-)
+def _isReactionNode(item):
+    """Return if a (node id, node attributes) item of the graph is a reaction
+
+    :param item: The node id and the node attributes
+    :type item: tuple
+
+    :rtype: bool
+    :return: If the node is a reaction
+    """
+    return item[1].get('type')=='reaction'
+
 
 class rpGraph:
     """The class that hosts the networkx related functions
@@ -43,9 +48,19 @@ class rpGraph:
         self.central_species_group_id = central_species_group_id
         self.sink_species_group_id = sink_species_group_id
         self.G = None
+        #reaction graph where r1 -> r2 if r1 produces a central species consumed by r2, built on demand
+        self.R = None
         self.pathway_id = pathway_id
         self.num_reactions = 0
         self.num_species = 0
+        #number of successors and predecessors of the nodes of self.G, indexed by the position of the nodes in self._node_ids
+        self._node_ids = []
+        self._succ_deg = None
+        self._pred_deg = None
+        #node flags, indexed by the position of the nodes in self._node_ids
+        self._is_species = None
+        self._is_central = None
+        self._is_rp_pathway = None
         if rpsbml:
             self._makeGraph(is_gem_sbml, pathway_id, central_species_group_id, sink_species_group_id)
 
@@ -73,65 +88,156 @@ class rpGraph:
         :rtype: None
         """
         rpsbml_model = self.rpsbml.getModel()
-        #rp_species = [rpsbml_model.getSpecies(i) for i in self.rpsbml.readUniqueRPspecies(pathway_id)]
         groups = rpsbml_model.getPlugin('groups')
         c_s = groups.getGroup(central_species_group_id)
         s_s = groups.getGroup(sink_species_group_id)
-        rp_central_species_id = [i.getIdRef() for i in c_s.getListOfMembers()]
-        rp_sink_species_id = [i.getIdRef() for i in s_s.getListOfMembers()]
+        rp_central_species_id = frozenset(i.getIdRef() for i in c_s.getListOfMembers())
+        rp_sink_species_id = frozenset(i.getIdRef() for i in s_s.getListOfMembers())
         rp_pathway = groups.getGroup(pathway_id)
-        rp_species_id = self.rpsbml.readUniqueRPspecies(pathway_id)
-        rp_reactions_id = [i.getIdRef() for i in rp_pathway.getListOfMembers()]
-        self.logger.debug('rp_reactions_id: '+str(rp_reactions_id))
+        rp_reactions_id = frozenset(i.getIdRef() for i in rp_pathway.getListOfMembers())
+        self.logger.debug('rp_reactions_id: %s', rp_reactions_id)
+        #read the reactions once, with their reactants and products, and reuse them for the nodes and the edges
+        reactions = []
+        for reaction in rpsbml_model.getListOfReactions():
+            reaction_id = reaction.getId()
+            is_rp_pathway = False
+            if reaction_id in rp_reactions_id:
+                is_rp_pathway = True
+            if is_rp_pathway or is_gem_sbml:
+                reactions.append((reaction_id,
+                                  reaction,
+                                  is_rp_pathway,
+                                  [(i.getSpecies(), i.getStoichiometry()) for i in reaction.getListOfReactants()],
+                                  [(i.getSpecies(), i.getStoichiometry()) for i in reaction.getListOfProducts()]))
+        rp_species_id = frozenset(species_id
+                                  for reaction_id, reaction, is_rp_pathway, reactants, products in reactions
+                                  if is_rp_pathway
+                                  for species_id, stoichio in itertools.chain(reactants, products))
         self.G = nx.DiGraph(brsynth=self.rpsbml.readBRSYNTHAnnotation(rp_pathway.getAnnotation()))
         #### add ALL the species and reactions ####
         #nodes
+        species_nodes = []
         for species in rpsbml_model.getListOfSpecies():
+            species_id = species.getId()
             is_central = False
             is_sink = False
             is_rp_pathway = False
-            if species.getId() in rp_species_id:
+            if species_id in rp_species_id:
                 is_rp_pathway = True
-            if species.getId() in rp_central_species_id:
+            if species_id in rp_central_species_id:
                 is_central = True
-            if species.getId() in rp_sink_species_id:
+            if species_id in rp_sink_species_id:
                 is_sink = True
             #add it if GEM then all, or if rp_pathway
             if is_rp_pathway or is_gem_sbml:
-                self.num_species += 1
-                self.G.add_node(species.getId(),
-                                type='species',
-                                name=species.getName(),
-                                miriam=self.rpsbml.readMIRIAMAnnotation(species.getAnnotation()),
-                                brsynth=self.rpsbml.readBRSYNTHAnnotation(species.getAnnotation()),
-                                central_species=is_central,
-                                sink_species=is_sink,
-                                rp_pathway=is_rp_pathway)
-        for reaction in rpsbml_model.getListOfReactions():
-            is_rp_pathway = False
-            if reaction.getId() in rp_reactions_id:
-                is_rp_pathway = True
-            if is_rp_pathway or is_gem_sbml:
-                self.num_reactions += 1
-                self.G.add_node(reaction.getId(),
-                                type='reaction',
-                                miriam=self.rpsbml.readMIRIAMAnnotation(reaction.getAnnotation()),
-                                brsynth=self.rpsbml.readBRSYNTHAnnotation(reaction.getAnnotation()),
-                                rp_pathway=is_rp_pathway)
-        #edges
-        for reaction in rpsbml_model.getListOfReactions():
-            self.logger.debug('Adding edges for the reaction: '+str(reaction.getId()))
-            if reaction.getId() in rp_reactions_id or is_gem_sbml:
-                for reac in reaction.getListOfReactants():
-                    self.logger.debug('\taAdding edge '+str(reac.species)+' --> '+str(reaction.getId()))
-                    self.G.add_edge(reac.species,
-                                    reaction.getId(),
-                                    stoichio=reac.stoichiometry)
-                for prod in reaction.getListOfProducts():
-                    self.logger.debug('\taAdding edge '+str(reaction.getId())+' --> '+str(prod.species))
-                    self.G.add_edge(reaction.getId(),
-                                    prod.species,
-                                    stoichio=reac.stoichiometry)
+                annot = species.getAnnotation()
+                species_nodes.append((species_id,
+                                      {'type': 'species',
+                                       'name': species.getName(),
+                                       'miriam': self.rpsbml.readMIRIAMAnnotation(annot),
+                                       'brsynth': self.rpsbml.readBRSYNTHAnnotation(annot),
+                                       'central_species': is_central,
+                                       'sink_species': is_sink,
+                                       'rp_pathway': is_rp_pathway}))
+        self.G.add_nodes_from(species_nodes)
+        self.num_species += len(species_nodes)
+        reaction_nodes = []
+        edges = []
+        for reaction_id, reaction, is_rp_pathway, reactants, products in reactions:
+            annot = reaction.getAnnotation()
+            reaction_nodes.append((reaction_id,
+                                   {'type': 'reaction',
+                                    'miriam': self.rpsbml.readMIRIAMAnnotation(annot),
+                                    'brsynth': self.rpsbml.readBRSYNTHAnnotation(annot),
+                                    'rp_pathway': is_rp_pathway}))
+            #edges
+            for species_id, stoichio in reactants:
+                edges.append((species_id, reaction_id, {'stoichio': stoichio}))
+            for species_id, stoichio in products:
+                edges.append((reaction_id, species_id, {'stoichio': stoichio}))
+        self.G.add_nodes_from(reaction_nodes)
+        self.num_reactions += len(reaction_nodes)
+        self.logger.debug('Adding %s edges', len(edges))
+        self.G.add_edges_from(edges)
+        self.R = None
+        self._makeNodeArrays()
+
+
+    def _makeNodeArrays(self):
+        """Private function that builds the degree and flag arrays of the nodes of the graph
+
+        The number of successors and predecessors of the node at position i are self._succ_deg[i] and
+        self._pred_deg[i]. The graph is not modified after its construction, so the arrays are built once.
+
+        :return: None
+        :rtype: None
+        """
+        self._node_ids = list(self.G._node)
+        num_nodes = len(self._node_ids)
+        succ = self.G._succ
+        pred = self.G._pred
+        self._succ_deg = np.fromiter((len(succ[i]) for i in self._node_ids), dtype=np.int32, count=num_nodes)
+        self._pred_deg = np.fromiter((len(pred[i]) for i in self._node_ids), dtype=np.int32, count=num_nodes)
+        nodes = [self.G._node[i] for i in self._node_ids]
+        self._is_species = np.fromiter((i.get('type')=='species' for i in nodes), dtype=np.bool_, count=num_nodes)
+        self._is_central = np.fromiter((bool(i.get('central_species')) for i in nodes), dtype=np.bool_, count=num_nodes)
+        self._is_rp_pathway = np.fromiter((bool(i.get('rp_pathway')) for i in nodes), dtype=np.bool_, count=num_nodes)
+
+
+    def _speciesMask(self, only_central=False, only_rp_pathway=True):
+        """Private function that returns the mask of the species nodes selected by the filter flags
+
+        :param only_central: Focus on the central species only
+        :param only_rp_pathway: Focus on the heterologous pathway species only
+
+        :type only_central: bool
+        :type only_rp_pathway: bool
+
+        :return: Boolean array indexed by the position of the nodes
+        :rtype: numpy.ndarray
+        """
+        #NOTE: if central species then must also be rp_pathway species
+        if not only_central and not only_rp_pathway:
+            return self._is_species
+        mask = np.zeros(len(self._node_ids), dtype=np.bool_)
+        if only_central:
+            mask |= self._is_central
+        if only_rp_pathway:
+            mask |= self._is_rp_pathway
+        return self._is_species & mask
+
+
+    def _reactionGraph(self):
+        """Private function that returns the reaction graph, built on the first call
+
+        :return: The reaction graph
+        :rtype: networkx.DiGraph
+        """
+        if self.R is None:
+            self.R = self._makeReactionGraph()
+        return self.R
+
+
+    def _makeReactionGraph(self):
+        """Private function that projects the graph on its reactions
+
+        A reaction r1 is linked to a reaction r2 if r1 produces a central species that is consumed by r2
+
+        :return: The reaction graph
+        :rtype: networkx.DiGraph
+        """
+        nodes = self.G._node
+        succ = self.G._succ
+        reactions_id = [node_name for node_name, node in filter(_isReactionNode, nodes.items())]
+        R = nx.DiGraph()
+        R.add_nodes_from(reactions_id)
+        R.add_edges_from((reaction_id, next_reaction_id)
+                         for reaction_id in reactions_id
+                         for species_id in succ[reaction_id]
+                         if nodes[species_id].get('central_species')
+                         for next_reaction_id in succ[species_id]
+                         if not next_reaction_id==reaction_id)
+        return R
 
 
     def onlyConsumedSpecies(self, only_central=False, only_rp_pathway=True):
@@ -144,15 +250,8 @@ class rpGraph:
         :return: List of node ids
         :rtype: list
         """
-        only_consumed_species = []
-        for node_name in self.G.nodes():
-            node = self.G.nodes.get(node_name)
-            if node['type']=='species':
-                #NOTE: if central species then must also be rp_pathway species
-                if (only_central and node['central_species']==True) or (only_rp_pathway and node['rp_pathway']==True) or (not only_central and not only_rp_pathway):
-                    if not len(list(self.G.successors(node_name)))==0 and len(list(self.G.predecessors(node_name)))==0:
-                        only_consumed_species.append(node_name)
-        return only_consumed_species
+        mask = self._speciesMask(only_central, only_rp_pathway) & (self._succ_deg>0) & (self._pred_deg==0)
+        return [self._node_ids[i] for i in np.flatnonzero(mask)]
 
 
     def onlyProducedSpecies(self, only_central=False, only_rp_pathway=True):
@@ -165,104 +264,84 @@ class rpGraph:
         :return: List of node ids
         :rtype: list
         """
-        only_produced_species = []
-        for node_name in self.G.nodes():
-            node = self.G.nodes.get(node_name)
-            self.logger.debug('node_name: '+str(node_name))
-            self.logger.debug('node: '+str(node))
-            if node['type']=='species':
-                #NOTE: if central species then must also be rp_pathway species
-                if (only_central and node['central_species']==True) or (only_rp_pathway and node['rp_pathway']==True) or (not only_central and not only_rp_pathway):
-                    if len(list(self.G.successors(node_name)))==0 and len(list(self.G.predecessors(node_name)))>0:
-                        only_produced_species.append(node_name)
-        return only_produced_species
-
-
-    ## Recursive function that finds the order of the reactions in the graph
-    #
-    # NOTE: only works for linear pathways... need to find a better way ie. Tree's
-    #
-    def _recursiveReacSuccessors(self, node_name, reac_list, all_res, num_reactions):
-        current_reac_list = [i for i in reac_list]
-        self.logger.debug('-------- '+str(node_name)+' --> '+str(reac_list)+' ----------')
-        succ_node_list = [i for i in self.G.successors(node_name)]
-        flat_reac_list = [i for sublist in reac_list for i in sublist]
-        self.logger.debug('flat_reac_list: '+str(flat_reac_list))
-        self.logger.debug('current_reac_list: '+str(current_reac_list))
-        if len(flat_reac_list)==num_reactions:
-            self.logger.debug('Returning')
-            #return current_reac_list
-            all_res.append(current_reac_list)
-            return all_res
-        self.logger.debug('succ_node_list: '+str(succ_node_list))
-        if not succ_node_list==[]:
+        mask = self._speciesMask(only_central, only_rp_pathway) & (self._pred_deg>0) & (self._succ_deg==0)
+        return [self._node_ids[i] for i in np.flatnonzero(mask)]
+
+
+    def _walkReacSteps(self, adjacency, node_name, reac_list, flat_set, all_res, num_reactions):
+        """Private function that walks the graph from a node and collects the reactions step by step
+
+        Iterative depth first search with an explicit stack that visits the nodes in the same order
+        as the former recursive walk. Each step is the list of the reactions reached from the previous one that
+        have not been visited yet, and central species are crossed to reach the next reactions. A result
+        is recorded every time the steps cover num_reactions reactions.
+
+        :param adjacency: The adjacency dict to follow (self.G._succ or self.G._pred)
+        :param node_name: The id of the starting node
+        :param reac_list: The steps of reactions that already have been run
+        :param flat_set: The reactions of reac_list
+        :param all_res: The list where the results are added
+        :param num_reactions: The number of reactions to reach
+
+        :type adjacency: dict
+        :type node_name: str
+        :type reac_list: list
+        :type flat_set: set
+        :type all_res: list
+        :type num_reactions: int
+
+        :return: List of the steps of reactions found
+        :rtype: list
+        """
+        nodes = self.G._node
+        is_debug = self.logger.isEnabledFor(logging.DEBUG)
+        stack = [(node_name, list(reac_list), frozenset(flat_set))]
+        while stack:
+            node_name, current_reac_list, flat_reac = stack.pop()
+            if is_debug:
+                self.logger.debug('-------- %s --> %s ----------', node_name, current_reac_list)
+            if len(flat_reac)==num_reactions:
+                if is_debug:
+                    self.logger.debug('Returning')
+                all_res.append(list(current_reac_list))
+                continue
+            next_nodes = adjacency[node_name]
             #can be multiple reactions at a given step
-            multi_reac = []
-            for n_n in succ_node_list:
-                n = self.G.nodes.get(n_n)
-                if n['type']=='reaction':
-                    if not n_n in flat_reac_list:
-                        multi_reac.append(n_n)
-            #remove the ones that already exist
-            self.logger.debug('multi_reac: '+str(multi_reac))
-            multi_reac = [x for x in multi_reac if x not in flat_reac_list]
-            self.logger.debug('multi_reac: '+str(multi_reac))
+            multi_reac = [n_n for n_n in next_nodes if nodes[n_n].get('type')=='reaction' and not n_n in flat_reac]
+            if is_debug:
+                self.logger.debug('multi_reac: %s', multi_reac)
             if multi_reac:
-                current_reac_list.append(multi_reac)
-            self.logger.debug('current_reac_list: '+str(current_reac_list))
-            #loop through all the possibilities
-            for n_n in succ_node_list:
-                n = self.G.nodes.get(n_n)
+                current_reac_list = current_reac_list+[multi_reac]
+                flat_reac = flat_reac.union(multi_reac)
+            #loop through all the possibilities, pushed in reverse to be popped in order
+            new_reac = frozenset(multi_reac)
+            next_steps = []
+            for n_n in next_nodes:
+                n = nodes[n_n]
                 if n['type']=='reaction':
-                    if n_n in multi_reac:
-                        self._recursiveReacSuccessors(n_n, current_reac_list, all_res, num_reactions)
+                    if n_n in new_reac:
+                        next_steps.append(n_n)
                 elif n['type']=='species':
                     if n['central_species']==True:
-                        self._recursiveReacSuccessors(n_n, current_reac_list, all_res, num_reactions)
+                        next_steps.append(n_n)
+            stack.extend((n_n, current_reac_list, flat_reac) for n_n in reversed(next_steps))
         return all_res
 
 
-    ##
+    ## Function that walks the successors of a node to find the order of the reactions in the graph
     #
-    # NOTE: only works for linear pathways... need to find a better way
+    # NOTE: only works for linear pathways... need to find a better way ie. Tree's
     #
-    def _recursiveReacPredecessors(self, node_name, reac_list, all_res, num_reactions):
-        current_reac_list = [i for i in reac_list]
-        self.logger.debug('-------- '+str(node_name)+' --> '+str(reac_list)+' ----------')
-        pred_node_list = [i for i in self.G.predecessors(node_name)]
-        flat_reac_list = [i for sublist in reac_list for i in sublist]
-        self.logger.debug('flat_reac_list: '+str(flat_reac_list))
-        self.logger.debug('current_reac_list: '+str(current_reac_list))
-        if len(flat_reac_list)==num_reactions:
-            self.logger.debug('Returning')
-            #return current_reac_list
-            all_res.append(current_reac_list)
-            return all_res
+    def _walkReacSuccessors(self, node_name, reac_list, flat_set, all_res, num_reactions):
+        return self._walkReacSteps(self.G._succ, node_name, reac_list, flat_set, all_res, num_reactions)
 
-            #can be multiple reactions at a given step
-            multi_reac = []
-            for n_n in pred_node_list:
-                n = self.G.nodes.get(n_n)
-                if n['type']=='reaction':
-                    if not n_n in flat_reac_list:
-                        multi_reac.append(n_n)
-            #remove the ones that already exist
-            self.logger.debug('multi_reac: '+str(multi_reac))
-            multi_reac = [x for x in multi_reac if x not in flat_reac_list]
-            self.logger.debug('multi_reac: '+str(multi_reac))
-            if multi_reac:
-                current_reac_list.append(multi_reac)
-            self.logger.debug('current_reac_list: '+str(current_reac_list))
-            #loop through all the possibilities
-            for n_n in pred_node_list:
-                n = self.G.nodes.get(n_n)
-                if n['type']=='reaction':
-                    if n_n in multi_reac:
-                        self._recursiveReacPredecessors(n_n, current_reac_list, all_res, num_reactions)
-                elif n['type']=='species':
-                    if n['central_species']==True:
-                        self._recursiveReacPredecessors(n_n, current_reac_list, all_res, num_reactions)
-        return all_res
+
+    ## Function that walks the predecessors of a node to find the order of the reactions in the graph
+    #
+    # NOTE: only works for linear pathways... need to find a better way
+    #
+    def _walkReacPredecessors(self, node_name, reac_list, flat_set, all_res, num_reactions):
+        return self._walkReacSteps(self.G._pred, node_name, reac_list, flat_set, all_res, num_reactions)
 
 
     '''
@@ -275,99 +354,90 @@ class rpGraph:
     ######################################################################################################
 
 
-    def _recursiveReacPredecessors(self, node_name, reac_list):
-        """Return the next linear predecessors
+    ############################# graph analysis ################################
 
-        Better than before, however bases itself on the fact that central species do not have multiple predesessors
-        if that is the case then the algorithm will return badly ordered reactions
 
-        :param node_name: The id of the starting node
-        :param reac_list: The list of reactions that already have been run
+    def exportJSON(self):
+        """Public function that returns the graph in the networkx node-link format
 
-        :type node_name: str
-        :type reac_list: list
+        Same output as networkx.readwrite.json_graph.node_link_data, built directly from the node and adjacency dicts
 
-        :return: List of node ids
-        :rtype: list
+        :return: The JSON serialisable dictionary of the graph
+        :rtype: dict
         """
-        self.logger.debug('-------- '+str(node_name)+' --> '+str(reac_list)+' ----------')
-        pred_node_list = [i for i in self.G.predecessors(node_name)]
-        self.logger.debug(pred_node_list)
-        if pred_node_list==[]:
-            return reac_list
-        for n_n in pred_node_list:
-            n = self.G.nodes.get(n_n)
-            if n['type']=='reaction':
-                if n_n in reac_list:
-                    return reac_list
-                else:
-                    reac_list.append(n_n)
-                    self._recursiveReacPredecessors(n_n, reac_list)
-            elif n['type']=='species':
-                if n['central_species']==True:
-                    self._recursiveReacPredecessors(n_n, reac_list)
-                else:
-                    return reac_list
-        return reac_list
+        return {'directed': True,
+                'multigraph': False,
+                'graph': self.G.graph,
+                'nodes': [{**node, 'id': node_name} for node_name, node in self.G._node.items()],
+                'links': [{**edge, 'source': source, 'target': target}
+                          for source, targets in self.G._succ.items()
+                          for target, edge in targets.items()]}
 
 
+    ## Warning that the fallback search algorithm only works for mono-component that are not networks (i.e where reactions follow each other)
+    #
     def orderedRetroReactions(self):
-        """Public function to return the linear list of reactions
+        """Public function to return the steps of reactions of the pathway, from the first to the last
 
-        :return: List of node ids
+        The steps are the topological generations of the reaction graph, so that every reaction comes after
+        the reactions producing its central species. If the reactions are not all linked through central
+        species (for example when the central species group is empty or misses intermediates), or if the
+        reaction graph is not acyclic, fall back to walking the graph from the consumed and the produced
+        central species.
+
+        :return: List of list of node ids
         :rtype: list
         """
-        #Note: may be better to loop tho
-        for prod_spe in self._onlyProducedSpecies():
-            self.logger.debug('Testing '+str(prod_spe))
-            ordered = self._recursiveReacPredecessors(prod_spe, [])
-            self.logger.debug(ordered)
-            if len(ordered)==self.num_reactions:
-                return [i for i in reversed(ordered)]
-        self.logger.error('Could not find the full ordered reactions')
-        return []
-
-    ############################# graph analysis ################################
-
-
-    def exportJSON(self):
-        return json_graph.node_link_data(self.G)
-
-
-    ## Warning that this search algorithm only works for mono-component that are not networks (i.e where reactions follow each other)
-    # DEPRECATED: this is linear
-    # NOTE: only works for linear pathways... need to find a better way
-    #
-    def orderedRetroReactions(self):
+        assert self.G is not None, 'The graph has not been built'
+        R = self._reactionGraph()
+        #without links between the reactions, every reaction would be returned in the same first step
+        if R.number_of_nodes()>1 and not nx.is_weakly_connected(R):
+            self.logger.warning('The reactions are not all linked through central species, walking the graph instead')
+        elif nx.is_directed_acyclic_graph(R):
+            ordered = []
+            steps = {}
+            for reaction_id in nx.topological_sort(R):
+                step = max((steps[i] for i in R._pred[reaction_id]), default=-1)+1
+                steps[reaction_id] = step
+                if step==len(ordered):
+                    ordered.append([])
+                ordered[step].append(reaction_id)
+            self.logger.debug('Found solution: %s', ordered)
+            return ordered
+        else:
+            self.logger.warning('The reactions do not form an acyclic graph, walking the graph instead')
         #Note: may be better to loop tho
         succ_res = []
-        for cons_cent_spe in self._onlyConsumedSpecies():
-            res = self._recursiveReacSuccessors(cons_cent_spe, [], [], self.num_reactions)
+        for cons_cent_spe in self.onlyConsumedSpecies(only_central=True, only_rp_pathway=False):
+            res = self._walkReacSuccessors(cons_cent_spe, [], set(), [], self.num_reactions)
             if res:
                 self.logger.debug(res)
                 if len(res)==1:
                     succ_res = res[0]
                 else:
-                    self.logger.error('Multiple successors results: '+str(res))
+                    self.logger.error('Multiple successors results: %s', res)
             else:
                 self.logger.warning('Successors no results')
+        #the predecessors walk only corroborates a full successors result, run it when debugging
+        if succ_res and sum(len(i) for i in succ_res)==self.num_reactions and not self.logger.isEnabledFor(logging.DEBUG):
+            return succ_res
         prod_res = []
-        for prod_cent_spe in self._onlyProducedSpecies():
-            res = self._recursiveReacPredecessors(prod_cent_spe, [], [], self.num_reactions)
+        for prod_cent_spe in self.onlyProducedSpecies(only_central=True, only_rp_pathway=False):
+            res = self._walkReacPredecessors(prod_cent_spe, [], set(), [], self.num_reactions)
             if res:
                 self.logger.debug(res)
                 if len(res)==1:
                     prod_res = [i for i in reversed(res[0])]
                 else:
-                    self.logger.error('Mutliple predecessors results: '+str(res))
+                    self.logger.error('Mutliple predecessors results: %s', res)
             else:
                 self.logger.warning('Predecessors no results')
         if succ_res and prod_res:
             if not succ_res==prod_res:
                 self.logger.warning('Both produce results and are not the same')
-                self.logger.warning('succ_res: '+str(succ_res))
-                self.logger.warning('prod_res: '+str(prod_res))
+                self.logger.warning('succ_res: %s', succ_res)
+                self.logger.warning('prod_res: %s', prod_res)
             else:
-                self.logger.debug('Found solution: '+str(succ_res))
+                self.logger.debug('Found solution: %s', succ_res)
                 return succ_res
         return []
@@ -1,20 +1,20 @@
-import logging
 import libsbml
 import numpy as np
 from hashlib  import sha256
 from os       import makedirs   as os_mkdirs
 from os       import path       as os_path
 from os       import replace    as os_replace
-from copy     import deepcopy
-from pandas   import DataFrame  as pd_DataFrame
 from inspect  import getmembers as inspect_getmembers
 from inspect  import ismethod   as inspect_ismethod
-from tempfile import TemporaryDirectory, NamedTemporaryFile
-from tarfile  import open       as tar_open
+from operator import itemgetter
+from collections import defaultdict
+from math     import sqrt
+from re       import compile    as re_compile
 from brs_libs import rpGraph
-from cobra    import io            as cobra_io
 from logging  import getLogger
 
+_LOG = getLogger(__name__)
+
 ## @package RetroPath SBML writer
 # Documentation for SBML representation of the different model
 #
@@ -24,11 +24,24 @@ from logging  import getLogger
 # The object holds an SBML object and a series of methods to write and access BRSYNTH related annotations
 
 
-logging.basicConfig(
-    level=logging.ERROR,
-    format='%(asctime)s.%(msecs)03d %(levelname)s %(module)s - %(funcName)s: %(message)s',
-    datefmt='%d-%m-%Y %H:%M:%S',
-)
+
+class _ReactionMatch:
+
+    """Species match of a source reaction, as compiled by rpSBML.compareReactions
+    """
+    __slots__ = ('reactants', 'products', 'reactants_score', 'products_score', 'species_score', 'species_std', 'score', 'found')
+
+    def __init__(self):
+        """Constructor for the _ReactionMatch class, with no species matched
+        """
+        self.reactants = {}
+        self.products = {}
+        self.reactants_score = 0.0
+        self.products_score = 0.0
+        self.species_score = 0.0
+        self.species_std = 0.0
+        self.score = 0.0
+        self.found = False
 
 
 ##################################################################
@@ -40,6 +53,63 @@ class rpSBML:
 
     """This class uses the libSBML object and handles it by adding BRSynth annotation
     """
+    #no per instance __dict__, all the instance attributes are declared here
+    __slots__ = ('logger', 'modelName', 'document', '_score_val', '_score_n', 'sbmlns')
+    #MIRIAM identifiers.org prefixes of the databases, per type of SBML element, and the reverse lookup
+    #shared by all the instances and not to be modified
+    miriam_header = {'compartment': {'mnx': 'metanetx.compartment/', 'bigg': 'bigg.compartment/', 'seed': 'seed/', 'name': 'name/'}, 'reaction': {'mnx': 'metanetx.reaction/', 'rhea': 'rhea/', 'reactome': 'reactome/', 'bigg': 'bigg.reaction/', 'sabiork': 'sabiork.reaction/', 'ec': 'ec-code/', 'biocyc': 'biocyc/', 'lipidmaps': 'lipidmaps/', 'uniprot': 'uniprot/'}, 'species': {'inchikey': 'inchikey/', 'pubchem': 'pubchem.compound/','mnx': 'metanetx.chemical/', 'chebi': 'chebi/CHEBI:', 'bigg': 'bigg.metabolite/', 'hmdb': 'hmdb/', 'kegg_c': 'kegg.compound/', 'kegg_d': 'kegg.drug/', 'biocyc': 'biocyc/META:', 'seed': 'seed.compound/', 'metacyc': 'metacyc.compound/', 'sabiork': 'sabiork.compound/', 'reactome': 'reactome/R-ALL-'}}
+    header_miriam = {'compartment': {'metanetx.compartment': 'mnx', 'bigg.compartment': 'bigg', 'seed': 'seed', 'name': 'name'}, 'reaction': {'metanetx.reaction': 'mnx', 'rhea': 'rhea', 'reactome': 'reactome', 'bigg.reaction': 'bigg', 'sabiork.reaction': 'sabiork', 'ec-code': 'ec', 'biocyc': 'biocyc', 'lipidmaps': 'lipidmaps', 'uniprot': 'uniprot'}, 'species': {'inchikey': 'inchikey', 'pubchem.compound': 'pubchem', 'metanetx.chemical': 'mnx', 'chebi': 'chebi', 'bigg.metabolite': 'bigg', 'hmdb': 'hmdb', 'kegg.compound': 'kegg_c', 'kegg.drug': 'kegg_d', 'biocyc': 'biocyc', 'seed.compound': 'seed', 'metacyc.compound': 'metacyc', 'sabiork.compound': 'sabiork', 'reactome': 'reactome'}}
+    #path of the XML children, from the annotation root, of the BRSynth annotation node
+    _BRSYNTH_PATH = ('RDF', 'BRSynth', 'brsynth')
+    #reader shared by all the instances to parse the SBML files
+    _READER = libsbml.SBMLReader()
+    #characters that are replaced by '_' in the SBML ids
+    _SBML_ID_INVALID = re_compile('[^0-9a-zA-Z]')
+    #default annotation strings, with both the MIRIAM and BRSynth annotations or only one, of a given meta id
+    _ANNOT_BOTH = '''<annotation>
+  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/">
+    <rdf:Description rdf:about="#{meta_id}">
+      <bqbiol:is>
+        <rdf:Bag>
+        </rdf:Bag>
+      </bqbiol:is>
+    </rdf:Description>
+    <rdf:BRSynth rdf:about="#{meta_id}">
+      <brsynth:brsynth xmlns:brsynth="http://brsynth.eu">
+      </brsynth:brsynth>
+    </rdf:BRSynth>
+  </rdf:RDF>
+</annotation>'''
+    _ANNOT_BRSYNTH = '''<annotation>
+  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/">
+    <rdf:BRSynth rdf:about="#{meta_id}">
+      <brsynth:brsynth xmlns:brsynth="http://brsynth.eu">
+      </brsynth:brsynth>
+    </rdf:BRSynth>
+  </rdf:RDF>
+</annotation>'''
+    _ANNOT_MIRIAM = '''<annotation>
+  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/">
+    <rdf:Description rdf:about="#{meta_id}">
+      <bqbiol:is>
+        <rdf:Bag>
+        </rdf:Bag>
+      </bqbiol:is>
+    </rdf:Description>
+  </rdf:RDF>
+</annotation>'''
+    #namespaces of the annotation entries parsed on their own by addUpdateBRSynth and addUpdateMIRIAM
+    _BRSYNTH_NS = libsbml.XMLNamespaces()
+    _BRSYNTH_NS.add('http://brsynth.eu', 'brsynth')
+    _RDF_NS = libsbml.XMLNamespaces()
+    _RDF_NS.add('http://www.w3.org/1999/02/22-rdf-syntax-ns#', 'rdf')
+    #BRSynth entry of a value alone, or as an attribute with or without its units
+    _BRSYNTH_ALONE = '<brsynth:{name}>{value}</brsynth:{name}>'
+    _BRSYNTH_UNITS = '<brsynth:{name} units="{units}" value="{value}" />'
+    _BRSYNTH_VALUE = '<brsynth:{name} value="{value}" />'
+    #MIRIAM entry of an identifiers.org uri
+    _MIRIAM_ENTRY = '<rdf:li rdf:resource="http://identifiers.org/{uri}"/>'
+
     def __init__(self, inFile='', document=None, name='', logger=None):
         """Constructor for the rpSBML class
 
@@ -54,7 +124,7 @@ class rpSBML:
         :type document: libsbml.SBMLDocument
         """
 
-        self.logger = logger or logging.getLogger(__name__)
+        self.logger = logger or _LOG
 
         self.modelName = None
         self.document  = None
@@ -73,10 +143,10 @@ class rpSBML:
         if not self.getName():
             self.modelName = 'dummy'
 
-        self.score = {'value': -1, 'nb_rules': 0}
+        #sum of the rule scores and number of rules
+        self._score_val = -1
+        self._score_n   = 0
 
-        self.miriam_header = {'compartment': {'mnx': 'metanetx.compartment/', 'bigg': 'bigg.compartment/', 'seed': 'seed/', 'name': 'name/'}, 'reaction': {'mnx': 'metanetx.reaction/', 'rhea': 'rhea/', 'reactome': 'reactome/', 'bigg': 'bigg.reaction/', 'sabiork': 'sabiork.reaction/', 'ec': 'ec-code/', 'biocyc': 'biocyc/', 'lipidmaps': 'lipidmaps/', 'uniprot': 'uniprot/'}, 'species': {'inchikey': 'inchikey/', 'pubchem': 'pubchem.compound/','mnx': 'metanetx.chemical/', 'chebi': 'chebi/CHEBI:', 'bigg': 'bigg.metabolite/', 'hmdb': 'hmdb/', 'kegg_c': 'kegg.compound/', 'kegg_d': 'kegg.drug/', 'biocyc': 'biocyc/META:', 'seed': 'seed.compound/', 'metacyc': 'metacyc.compound/', 'sabiork': 'sabiork.compound/', 'reactome': 'reactome/R-ALL-'}}
-        self.header_miriam = {'compartment': {'metanetx.compartment': 'mnx', 'bigg.compartment': 'bigg', 'seed': 'seed', 'name': 'name'}, 'reaction': {'metanetx.reaction': 'mnx', 'rhea': 'rhea', 'reactome': 'reactome', 'bigg.reaction': 'bigg', 'sabiork.reaction': 'sabiork', 'ec-code': 'ec', 'biocyc': 'biocyc', 'lipidmaps': 'lipidmaps', 'uniprot': 'uniprot'}, 'species': {'inchikey': 'inchikey', 'pubchem.compound': 'pubchem', 'metanetx.chemical': 'mnx', 'chebi': 'chebi', 'bigg.metabolite': 'bigg', 'hmdb': 'hmdb', 'kegg.compound': 'kegg_c', 'kegg.drug': 'kegg_d', 'biocyc': 'biocyc', 'seed.compound': 'seed', 'metacyc.compound': 'metacyc', 'sabiork.compound': 'sabiork', 'reactome': 'reactome'}}
 
     def getModel(self):
         if self.getDocument():
@@ -90,28 +160,33 @@ class rpSBML:
     def getName(self):
         if self.modelName:
             return self.modelName
-        elif self.getModel():
-            return self.getModel().getName()
+        model = self.getModel()
+        if model:
+            return model.getName()
         else:
             return None
 
     def compute_score(self, pathway_id='rp_pathway'):
-        self.score['value'] = 0
-        for member in self.readRPpathwayIDs(pathway_id):
-            reaction = self.getModel().getReaction(member)
-            self.add_rule_score(float(reaction.getAnnotation().getChild('RDF').getChild('BRSynth').getChild('brsynth').getChild('rule_score').getAttrValue('value')))
+        model = self.getModel()
+        rule_score_path = rpSBML._BRSYNTH_PATH+('rule_score',)
+        rule_scores = np.fromiter(
+            (float(rpSBML._walkAnnotation(model.getReaction(member).getAnnotation(), rule_score_path).getAttrValue('value'))
+             for member in self.readRPpathwayIDs(pathway_id)),
+            dtype=np.float64)
+        self._score_val = float(rule_scores.sum())
+        self._score_n   = int(rule_scores.size)
         return self.getScore()
 
     def getScore(self):
         try:
-            return self.score['value'] / self.score['nb_rules']
+            return self._score_val / self._score_n
         except ZeroDivisionError as e:
             self.logger.error(e)
             return -1
 
     def add_rule_score(self, score):
-        self.score['value']    += score
-        self.score['nb_rules'] += 1
+        self._score_val += score
+        self._score_n   += 1
 
     #############################################################################################################
     ############################################ MERGE ##########################################################
@@ -138,7 +213,7 @@ class rpSBML:
         :return: Success or failure of the function
         :rtype: bool
         """
-        logger = logger or logging.getLogger(__name__)
+        logger = logger or _LOG
         if not os_path.exists(input_sbml):
             logger.error('Source SBML file is invalid: '+str(input_sbml))
             return False
@@ -172,34 +247,36 @@ class rpSBML:
         :return: Tuple of dict where the first entry is the species source to target conversion and the second is the reaction source to target conversion
         :rtype: tuple
         """
-        logger = logger or logging.getLogger(__name__)
+        logger = logger or _LOG
+        source_model = source_rpsbml.getModel()
+        target_model = target_rpsbml.getModel()
         #target_rpsbml.model = target_document.getModel()
         #Find the ID's of the similar target_rpsbml.model species
         ################ MODEL FBC ########################
-        if not target_rpsbml.getModel().isPackageEnabled('fbc'):
-            rpSBML.checklibSBML(target_rpsbml.getModel().enablePackage(
+        if not target_model.isPackageEnabled('fbc'):
+            rpSBML.checklibSBML(target_model.enablePackage(
                 'http://www.sbml.org/sbml/level3/version1/fbc/version2',
                 'fbc',
                 True),
                     'Enabling the FBC package')
-        if not source_rpsbml.getModel().isPackageEnabled('fbc'):
-            rpSBML.checklibSBML(source_rpsbml.getModel().enablePackage(
+        if not source_model.isPackageEnabled('fbc'):
+            rpSBML.checklibSBML(source_model.enablePackage(
                 'http://www.sbml.org/sbml/level3/version1/fbc/version2',
                 'fbc',
                 True),
                     'Enabling the FBC package')
-        target_fbc = target_rpsbml.getModel().getPlugin('fbc')
-        source_fbc = source_rpsbml.getModel().getPlugin('fbc')
+        target_fbc = target_model.getPlugin('fbc')
+        source_fbc = source_model.getPlugin('fbc')
         # note sure why one needs to set this as False
         rpSBML.checklibSBML(source_rpsbml.document.setPackageRequired('fbc', False), 'enabling FBC package')
         ################ UNITDEFINITIONS ######
         # return the list of unit definitions id's for the target to avoid overwritting
         # WARNING: this means that the original unit definitions will be prefered over the new one
-        target_unitDefID = [i.getId() for i in target_rpsbml.getModel().getListOfUnitDefinitions()]
-        for source_unitDef in source_rpsbml.getModel().getListOfUnitDefinitions():
+        target_unitDefID = {i.getId() for i in target_model.getListOfUnitDefinitions()}
+        for source_unitDef in source_model.getListOfUnitDefinitions():
             if not source_unitDef.getId() in target_unitDefID: # have to compare by ID since no annotation
                 # create a new unitDef in the target
-                target_unitDef = target_rpsbml.getModel().createUnitDefinition()
+                target_unitDef = target_model.createUnitDefinition()
                 rpSBML.checklibSBML(target_unitDef, 'fetching target unit definition')
                 #copy unitDef info to the target
                 rpSBML.checklibSBML(target_unitDef.setId(source_unitDef.getId()),
@@ -218,28 +295,40 @@ class rpSBML:
                         'setting target unit scale')
                     rpSBML.checklibSBML(target_unit.setMultiplier(source_unit.getMultiplier()),
                         'setting target unit multiplier')
-                target_unitDefID.append(source_unitDef.getId()) #add to the list to make sure its not added twice
+                target_unitDefID.add(source_unitDef.getId()) #add to the set to make sure its not added twice
         ################ COMPARTMENTS ###############
         # Compare by MIRIAM annotations
         #Note that key is source and value is target conversion
         comp_source_target = {}
-        for source_compartment in source_rpsbml.getModel().getListOfCompartments():
+        # index the MIRIAM (database, id) pairs of the target compartments to their position and id,
+        # the first target compartment in the list wins as with a pairwise comparison
+        target_comp_miriam = {}
+        num_target_comp = 0
+        for target_compartment in target_model.getListOfCompartments():
+            target_annotation = target_compartment.getAnnotation()
+            if not target_annotation:
+                logger.warning('No annotation for the target of compartment: '+str(target_compartment.getId()))
+            else:
+                for miriam_key in source_rpsbml.readMIRIAMKeys(target_annotation):
+                    target_comp_miriam.setdefault(miriam_key, (num_target_comp, target_compartment.getId()))
+            num_target_comp += 1
+        target_ids = {i.getId() for i in target_model.getListOfCompartments()}
+        for source_compartment in source_model.getListOfCompartments():
             found = False
-            target_ids = [i.getId() for i in target_rpsbml.getModel().getListOfCompartments()]
             source_annotation = source_compartment.getAnnotation()
             if not source_annotation:
                 logger.warning('No annotation for the source of compartment '+str(source_compartment.getId()))
                 continue
-            # compare by MIRIAM first
-            for target_compartment in target_rpsbml.getModel().getListOfCompartments():
-                target_annotation = target_compartment.getAnnotation()
-                if not target_annotation:
-                    logger.warning('No annotation for the target of compartment: '+str(target_compartment.getId()))
-                    continue
-                if source_rpsbml.compareMIRIAMAnnotations(source_annotation, target_annotation):
-                    found = True
-                    comp_source_target[source_compartment.getId()] = target_compartment.getId()
-                    break
+            # compare by MIRIAM first, the source annotation is only parsed if a target compartment can match it
+            if target_comp_miriam:
+                source_miriam_keys = source_rpsbml.readMIRIAMKeys(source_annotation)
+                target_match = min((target_comp_miriam[i] for i in source_miriam_keys if i in target_comp_miriam), default=None)
+            else:
+                source_miriam_keys = set()
+                target_match = None
+            if target_match:
+                found = True
+                comp_source_target[source_compartment.getId()] = target_match[1]
             if not found:
                 #if the id is not found, see if the ids already exists
                 if source_compartment.getId() in target_ids:
@@ -247,7 +336,7 @@ class rpSBML:
                     found = True
                 #if there is not MIRIAM match and the id's differ then add it
                 else:
-                    target_compartment = target_rpsbml.getModel().createCompartment()
+                    target_compartment = target_model.createCompartment()
                     rpSBML.checklibSBML(target_compartment, 'Creating target compartment')
                     rpSBML.checklibSBML(target_compartment.setMetaId(source_compartment.getMetaId()),
                             'setting target metaId')
@@ -267,13 +356,19 @@ class rpSBML:
                     rpSBML.checklibSBML(target_compartment.setSBOTerm(source_compartment.getSBOTerm()),
                             'setting target annotation')
                     comp_source_target[target_compartment.getId()] = target_compartment.getId()
+                    target_ids.add(target_compartment.getId())
+                    if not source_miriam_keys:
+                        source_miriam_keys = source_rpsbml.readMIRIAMKeys(source_annotation)
+                    for miriam_key in source_miriam_keys:
+                        target_comp_miriam.setdefault(miriam_key, (num_target_comp, target_compartment.getId()))
+                    num_target_comp += 1
         # self.logger.debug('comp_source_target: '+str(comp_source_target))
         ################ PARAMETERS ###########
         # WARNING: here we compare by ID
-        targetParametersID = [i.getId() for i in target_rpsbml.getModel().getListOfParameters()]
-        for source_parameter in source_rpsbml.getModel().getListOfParameters():
+        targetParametersID = {i.getId() for i in target_model.getListOfParameters()}
+        for source_parameter in source_model.getListOfParameters():
             if source_parameter.getId() not in targetParametersID:
-                target_parameter = target_rpsbml.getModel().createParameter()
+                target_parameter = target_model.createParameter()
                 rpSBML.checklibSBML(target_parameter, 'creating target parameter')
                 rpSBML.checklibSBML(target_parameter.setId(source_parameter.getId()), 'setting target parameter ID')
                 rpSBML.checklibSBML(target_parameter.setSBOTerm(source_parameter.getSBOTerm()),
@@ -286,7 +381,7 @@ class rpSBML:
                     'setting target parameter ID')
         ################ FBC GENE PRODUCTS ########################
         #WARNING: here we compare by ID
-        targetGenProductID = [i.getId() for i in target_fbc.getListOfGeneProducts()]
+        targetGenProductID = {i.getId() for i in target_fbc.getListOfGeneProducts()}
         for source_geneProduct in source_fbc.getListOfGeneProducts():
             if not source_geneProduct.getId() in targetGenProductID:
                 target_geneProduct = target_fbc.createGeneProduct()
@@ -302,8 +397,7 @@ class rpSBML:
         ############### FBC OBJECTIVES ############
         #WARNING: here we compare by ID
         #TODO: if overlapping id's need to replace the id with modified, as for the species
-        targetObjectiveID = [i.getId() for i in target_fbc.getListOfObjectives()]
-        sourceObjectiveID = [i.getId() for i in source_fbc.getListOfObjectives()]
+        targetObjectiveID = {i.getId() for i in target_fbc.getListOfObjectives()}
         for source_objective in source_fbc.getListOfObjectives():
             if not source_objective.getId() in targetObjectiveID:
                 target_objective = target_fbc.createObjective()
@@ -326,87 +420,82 @@ class rpSBML:
                 rpSBML.checklibSBML(target_objective.setAnnotation(source_objective.getAnnotation()),
                         'setting target obj annotation from source obj')
         # self.logger.debug('targetObjectiveID: '+str(targetObjectiveID))
-        # self.logger.debug('sourceObjectiveID: '+str(sourceObjectiveID))
         ################ SPECIES ####################
         species_source_target = rpSBML.compareSpecies(comp_source_target, source_rpsbml, target_rpsbml, logger=logger)
         # self.logger.debug('species_source_target: '+str(species_source_target))
-        target_species_ids = [i.id for i in target_rpsbml.getModel().getListOfSpecies()]
+        target_species_ids = {i.id for i in target_model.getListOfSpecies()}
         for source_species in species_source_target:
-            list_target = [i for i in species_source_target[source_species]]
-            if source_species in list_target:
-                logger.warning('The source ('+str(source_species)+') and target species ids ('+str(list_target)+') are the same')
+            target_species = species_source_target[source_species]
+            if source_species in target_species:
+                logger.warning('The source ('+str(source_species)+') and target species ids ('+str(list(target_species))+') are the same')
             #if match, replace the annotation from the source to the target
-            if not species_source_target[source_species]=={}:
-                list_species = [i for i in species_source_target[source_species]]
-                #self.logger.debug('list_species: '+str(list_species))
-                if len(list_species)==0:
-                    continue
-                    #self.logger.warning('Source species '+str(member.getIdRef())+' has been created in the target model')
-                elif len(list_species)>1:
-                    logger.warning('There are multiple matches to the species '+str(source_species)+'... taking the first one: '+str(list_species))
+            if not target_species=={}:
+                #self.logger.debug('target_species: '+str(target_species))
+                if len(target_species)>1:
+                    logger.warning('There are multiple matches to the species '+str(source_species)+'... taking the first one: '+str(list(target_species)))
                 #TODO: loop throught the annotations and replace the non-overlapping information
-                target_member = target_rpsbml.getModel().getSpecies(list_species[0])
-                source_member = source_rpsbml.getModel().getSpecies(source_species)
-                rpSBML.checklibSBML(target_member, 'Retraiving the target species: '+str(list_species[0]))
+                target_species_id = next(iter(target_species))
+                target_member = target_model.getSpecies(target_species_id)
+                source_member = source_model.getSpecies(source_species)
+                rpSBML.checklibSBML(target_member, 'Retraiving the target species: '+str(target_species_id))
                 rpSBML.checklibSBML(source_member, 'Retreiving the source species: '+str(source_species))
                 rpSBML.checklibSBML(target_member.setAnnotation(source_member.getAnnotation()), 'Replacing the annotations')
             #if no match then add it to the target model
             else:
                 # self.logger.debug('Creating source species '+str(source_species)+' in target rpsbml')
-                source_species = source_rpsbml.getModel().getSpecies(source_species)
+                source_species = source_model.getSpecies(source_species)
                 if not source_species:
                     logger.error('Cannot retreive model species: '+str(source_species))
                 else:
                     rpSBML.checklibSBML(source_species, 'fetching source species')
-                    targetModel_species = target_rpsbml.getModel().createSpecies()
+                    targetModel_species = target_model.createSpecies()
                     rpSBML.checklibSBML(targetModel_species, 'creating species')
-                    rpSBML.checklibSBML(targetModel_species.setMetaId(source_species.getMetaId()),
-                            'setting target metaId')
+                    set_meta_id = targetModel_species.setMetaId(source_species.getMetaId())
                     ## need to check if the id of the source species does not already exist in the target model
                     if source_species.getId() in target_species_ids:
-                        target_species_id = source_rpsbml.getModel().id+'__'+str(source_species.getId())
-                        if not source_species.getId() in species_source_target:
-                            species_source_target[source_species.getId()] = {}
-                        species_source_target[source_species.getId()][source_rpsbml.getModel().id+'__'+str(source_species.getId())] = 1.0
+                        target_species_id = source_model.id+'__'+str(source_species.getId())
+                        species_source_target.setdefault(source_species.getId(), {})[target_species_id] = 1.0
                     else:
                         target_species_id = source_species.getId()
-                    rpSBML.checklibSBML(targetModel_species.setId(target_species_id),
-                            'setting target id')
-                    rpSBML.checklibSBML(targetModel_species.setCompartment(comp_source_target[source_species.getCompartment()]),
-                            'setting target compartment')
-                    rpSBML.checklibSBML(targetModel_species.setInitialConcentration(
-                        source_species.getInitialConcentration()),
-                            'setting target initial concentration')
-                    rpSBML.checklibSBML(targetModel_species.setBoundaryCondition(
-                        source_species.getBoundaryCondition()),
-                            'setting target boundary concentration')
-                    rpSBML.checklibSBML(targetModel_species.setHasOnlySubstanceUnits(
-                        source_species.getHasOnlySubstanceUnits()),
-                            'setting target has only substance units')
-                    rpSBML.checklibSBML(targetModel_species.setBoundaryCondition(
-                        source_species.getBoundaryCondition()),
-                            'setting target boundary condition')
-                    rpSBML.checklibSBML(targetModel_species.setConstant(source_species.getConstant()),
-                        'setting target constant')
-                    rpSBML.checklibSBML(targetModel_species.setAnnotation(source_species.getAnnotation()),
-                        'setting target annotation')
+                    rpSBML.checklibSBMLList((
+                        set_meta_id,
+                        targetModel_species.setId(target_species_id),
+                        targetModel_species.setCompartment(comp_source_target[source_species.getCompartment()]),
+                        targetModel_species.setInitialConcentration(source_species.getInitialConcentration()),
+                        targetModel_species.setBoundaryCondition(source_species.getBoundaryCondition()),
+                        targetModel_species.setHasOnlySubstanceUnits(source_species.getHasOnlySubstanceUnits()),
+                        targetModel_species.setBoundaryCondition(source_species.getBoundaryCondition()),
+                        targetModel_species.setConstant(source_species.getConstant()),
+                        targetModel_species.setAnnotation(source_species.getAnnotation())),
+                        ('setting target metaId',
+                         'setting target id',
+                         'setting target compartment',
+                         'setting target initial concentration',
+                         'setting target boundary concentration',
+                         'setting target has only substance units',
+                         'setting target boundary condition',
+                         'setting target constant',
+                         'setting target annotation'),
+                        logger=logger)
         ################ REACTIONS ###################
         # TODO; consider the case where two reactions have the same ID's but are not the same reactions
         reactions_source_target = {}
-        for source_reaction in source_rpsbml.getModel().getListOfReactions():
+        # index the target reactions by their (converted) reactants and products, a source reaction matches the
+        # first target reaction (in the list order) that has the same reactants and products, as in compareReaction
+        target_reactions_index = {}
+        for target_reaction in target_model.getListOfReactions():
+            rpSBML._indexReaction(species_source_target, target_reaction, target_reactions_index)
+        for source_reaction in source_model.getListOfReactions():
             is_found = False
-            for target_reaction in target_rpsbml.getModel().getListOfReactions():
-                score, match = rpSBML.compareReaction(species_source_target, source_reaction, target_reaction, logger=logger)
-                if match:
-                    # self.logger.debug('Source reaction '+str(source_reaction)+' matches with target reaction '+str(target_reaction))
-                    # source_reaction[source_reaction.getId()] = target_reaction.getId()
-                    reactions_source_target[source_reaction.getId()] = target_reaction.getId()
-                    is_found = True
-                    break
+            target_match = rpSBML._findReactionMatch(source_reaction, target_reactions_index)
+            if target_match is not None:
+                # self.logger.debug('Source reaction '+str(source_reaction)+' matches with target reaction '+str(target_match))
+                reactions_source_target[source_reaction.getId()] = target_match
+                is_found = True
             if not is_found:
                 # self.logger.debug('Cannot find source reaction: '+str(source_reaction.getId()))
                 rpSBML.checklibSBML(source_reaction, 'fetching source reaction')
-                target_reaction = target_rpsbml.getModel().createReaction()
+                target_reaction = target_model.createReaction()
                 rpSBML.checklibSBML(target_reaction, 'create reaction')
                 target_fbc = target_reaction.getPlugin('fbc')
                 rpSBML.checklibSBML(target_fbc, 'fetching target FBC package')
@@ -420,108 +509,96 @@ class rpSBML:
                 rpSBML.checklibSBML(source_lowerFluxBound, 'fetching lower flux bound')
                 rpSBML.checklibSBML(target_fbc.setLowerFluxBound(source_lowerFluxBound),
                         'setting lower flux bound')
-                rpSBML.checklibSBML(target_reaction.setId(source_reaction.getId()), 'set reaction id')
-                rpSBML.checklibSBML(target_reaction.setName(source_reaction.getName()), 'set name')
-                rpSBML.checklibSBML(target_reaction.setSBOTerm(source_reaction.getSBOTerm()),
-                        'setting the reaction system biology ontology (SBO)') # set as process
                 # TODO: consider having the two parameters as input to the function
-                rpSBML.checklibSBML(target_reaction.setReversible(source_reaction.getReversible()),
-                        'set reaction reversibility flag')
-                rpSBML.checklibSBML(target_reaction.setFast(source_reaction.getFast()),
-                        'set reaction "fast" attribute')
-                rpSBML.checklibSBML(target_reaction.setMetaId(source_reaction.getMetaId()), 'setting species meta_id')
-                rpSBML.checklibSBML(target_reaction.setAnnotation(source_reaction.getAnnotation()),
-                        'setting annotation for source reaction')
+                rpSBML.checklibSBMLList((
+                    target_reaction.setId(source_reaction.getId()),
+                    target_reaction.setName(source_reaction.getName()),
+                    target_reaction.setSBOTerm(source_reaction.getSBOTerm()), # set as process
+                    target_reaction.setReversible(source_reaction.getReversible()),
+                    target_reaction.setFast(source_reaction.getFast()),
+                    target_reaction.setMetaId(source_reaction.getMetaId()),
+                    target_reaction.setAnnotation(source_reaction.getAnnotation())),
+                    ('set reaction id',
+                     'set name',
+                     'setting the reaction system biology ontology (SBO)',
+                     'set reaction reversibility flag',
+                     'set reaction "fast" attribute',
+                     'setting species meta_id',
+                     'setting annotation for source reaction'),
+                    logger=logger)
                 # Reactants
                 # self.logger.debug('Setting reactants')
-                for source_reaction_reactantID in [i.species for i in source_reaction.getListOfReactants()]:
+                for source_reactant in source_reaction.getListOfReactants():
+                    source_reaction_reactantID = source_reactant.species
                     # self.logger.debug('\tAdding '+str(source_reaction_reactantID))
                     target_reactant = target_reaction.createReactant()
                     rpSBML.checklibSBML(target_reactant, 'create target reactant')
-                    if source_reaction_reactantID in species_source_target:
-                        if not species_source_target[source_reaction_reactantID]=={}:
-                            if len(species_source_target[source_reaction_reactantID])>1:
-                                logger.warning('Multiple matches for '+str(source_reaction_reactantID)+': '+str(species_source_target[source_reaction_reactantID]))
-                                logger.warning('Taking one the first one arbitrarely: '+str([i for i in species_source_target[source_reaction_reactantID]][0]))
-                            # WARNING: taking the first one arbitrarely
-                            rpSBML.checklibSBML(target_reactant.setSpecies(
-                                [i for i in species_source_target[source_reaction_reactantID]][0]), 'assign reactant species')
-                        else:
-                            rpSBML.checklibSBML(target_reactant.setSpecies(source_reaction_reactantID),
-                                'assign reactant species')
-                    else:
-                        rpSBML.checklibSBML(target_reactant.setSpecies(source_reaction_reactantID),
-                            'assign reactant species')
-                    source_reactant = source_reaction.getReactant(source_reaction_reactantID)
-                    rpSBML.checklibSBML(source_reactant, 'fetch source reactant')
-                    rpSBML.checklibSBML(target_reactant.setConstant(source_reactant.getConstant()),
-                            'set "constant" on species '+str(source_reactant.getConstant()))
-                    rpSBML.checklibSBML(target_reactant.setStoichiometry(source_reactant.getStoichiometry()),
-                            'set stoichiometry ('+str(source_reactant.getStoichiometry)+')')
+                    mapped = species_source_target.get(source_reaction_reactantID)
+                    # WARNING: taking the first one arbitrarely
+                    species_id = next(iter(mapped)) if mapped else source_reaction_reactantID
+                    if mapped and len(mapped)>1:
+                        logger.warning('Multiple matches for '+str(source_reaction_reactantID)+': '+str(mapped))
+                        logger.warning('Taking one the first one arbitrarely: '+str(species_id))
+                    rpSBML.checklibSBML(target_reactant.setSpecies(species_id), 'assign reactant species')
+                    rpSBML.checklibSBMLList((
+                        target_reactant.setConstant(source_reactant.getConstant()),
+                        target_reactant.setStoichiometry(source_reactant.getStoichiometry())),
+                        ('set "constant" on species', 'set stoichiometry'),
+                        logger=logger)
                 # Products
                 # self.logger.debug('Setting products')
-                for source_reaction_productID in [i.species for i in source_reaction.getListOfProducts()]:
+                for source_product in source_reaction.getListOfProducts():
+                    source_reaction_productID = source_product.species
                     # self.logger.debug('\tAdding '+str(source_reaction_productID))
                     target_product = target_reaction.createProduct()
                     rpSBML.checklibSBML(target_product, 'create target reactant')
-                    if source_reaction_productID in species_source_target:
-                        if not species_source_target[source_reaction_productID]=={}:
-                            if len(species_source_target[source_reaction_reactantID])>1:
-                                logger.warning('Multiple matches for '+str(source_reaction_productID)+': '+str(species_source_target[source_reaction_productID]))
-                                logger.warning('Taking one arbitrarely')
-                            # WARNING: taking the first one arbitrarely
-                            rpSBML.checklibSBML(target_product.setSpecies(
-                                [i for i in species_source_target[source_reaction_productID]][0]), 'assign reactant product')
-                        else:
-                            rpSBML.checklibSBML(target_product.setSpecies(source_reaction_productID),
-                                'assign reactant product')
-                    else:
-                        rpSBML.checklibSBML(target_product.setSpecies(source_reaction_productID),
-                            'assign reactant product')
-                    source_product = source_reaction.getProduct(source_reaction_productID)
-                    rpSBML.checklibSBML(source_product, 'fetch source reactant')
-                    rpSBML.checklibSBML(target_product.setConstant(source_product.getConstant()),
-                            'set "constant" on product '+str(source_product.getConstant()))
-                    rpSBML.checklibSBML(target_product.setStoichiometry(source_product.getStoichiometry()),
-                            'set stoichiometry ('+str(source_product.getStoichiometry)+')')
+                    mapped = species_source_target.get(source_reaction_productID)
+                    # WARNING: taking the first one arbitrarely
+                    species_id = next(iter(mapped)) if mapped else source_reaction_productID
+                    if mapped and len(mapped)>1:
+                        logger.warning('Multiple matches for '+str(source_reaction_productID)+': '+str(mapped))
+                        logger.warning('Taking one arbitrarely')
+                    rpSBML.checklibSBML(target_product.setSpecies(species_id), 'assign reactant product')
+                    rpSBML.checklibSBMLList((
+                        target_product.setConstant(source_product.getConstant()),
+                        target_product.setStoichiometry(source_product.getStoichiometry())),
+                        ('set "constant" on product', 'set stoichiometry'),
+                        logger=logger)
+                # the new reaction can be matched by the next source reactions
+                rpSBML._indexReaction(species_source_target, target_reaction, target_reactions_index)
         #### GROUPS #####
         # TODO loop through the groups to add them
-        if not target_rpsbml.getModel().isPackageEnabled('groups'):
-            rpSBML.checklibSBML(target_rpsbml.getModel().enablePackage(
+        if not target_model.isPackageEnabled('groups'):
+            rpSBML.checklibSBML(target_model.enablePackage(
                 'http://www.sbml.org/sbml/level3/version1/groups/version1',
                 'groups',
                 True),
                     'Enabling the GROUPS package')
         #!!!! must be set to false for no apparent reason
         rpSBML.checklibSBML(source_rpsbml.document.setPackageRequired('groups', False), 'enabling groups package')
-        source_groups = source_rpsbml.getModel().getPlugin('groups')
+        source_groups = source_model.getPlugin('groups')
         rpSBML.checklibSBML(source_groups, 'fetching the source model groups')
-        target_groups = target_rpsbml.getModel().getPlugin('groups')
+        target_groups = target_model.getPlugin('groups')
         rpSBML.checklibSBML(target_groups, 'fetching the target model groups')
         # # self.logger.debug('species_source_target: '+str(species_source_target))
         # # self.logger.debug('reactions_source_target: '+str(reactions_source_target))
-        source_groups_ids = [i.id for i in source_groups.getListOfGroups()]
-        target_groups_ids = [i.id for i in target_groups.getListOfGroups()]
+        target_groups_ids = {i.id for i in target_groups.getListOfGroups()}
         #NOTE: only need to update the source species since these are the ones that are replaced with their equivalent
         for source_group in source_groups.getListOfGroups():
-            #overwrite in the group the reaction members that have been replaced
-            for member in source_group.getListOfMembers():
-                if member.getIdRef() in reactions_source_target:
-                    if reactions_source_target[member.getIdRef()]:
-                        member.setIdRef(reactions_source_target[member.getIdRef()])
-            #overwrite in the group the species members that have been replaced
+            #overwrite in the group the reaction and then the species members that have been replaced
             for member in source_group.getListOfMembers():
-                if member.getIdRef() in species_source_target:
-                    if species_source_target[member.getIdRef()]:
-                        list_species = [i for i in species_source_target[member.getIdRef()]]
-                        logger.debug('species_source_target: '+str(species_source_target))
-                        logger.debug('list_species: '+str(list_species))
-                        if len(list_species)==0:
-                            continue
-                            #self.logger.warning('Source species '+str(member.getIdRef())+' has been created in the target model')
-                        elif len(list_species)>1:
-                            logger.warning('There are multiple matches to the species '+str(member.getIdRef())+'... taking the first one: '+str(list_species))
-                        rpSBML.checklibSBML(member.setIdRef(list_species[0]), 'Setting name to the groups member')
+                member_id = member.getIdRef()
+                target_reaction = reactions_source_target.get(member_id)
+                if target_reaction:
+                    member.setIdRef(target_reaction)
+                    member_id = target_reaction
+                target_species = species_source_target.get(member_id)
+                if target_species:
+                    logger.debug('species_source_target: '+str(species_source_target))
+                    logger.debug('target_species: '+str(list(target_species)))
+                    if len(target_species)>1:
+                        logger.warning('There are multiple matches to the species '+str(member_id)+'... taking the first one: '+str(list(target_species)))
+                    rpSBML.checklibSBML(member.setIdRef(next(iter(target_species))), 'Setting name to the groups member')
             #create and add the groups if a source group does not exist in the target
             if not source_group.id in target_groups_ids:
                 rpSBML.checklibSBML(target_groups.addGroup(source_group),
@@ -529,15 +606,16 @@ class rpSBML:
             #if the group already exists in the target then need to add new members
             else:
                 target_group = target_groups.getGroup(source_group.id)
-                target_group_ids = [i.getIdRef() for i in target_group.getListOfMembers()]
+                target_group_ids = {i.getIdRef() for i in target_group.getListOfMembers()}
                 for member in source_group.getListOfMembers():
-                    if member.getIdRef() not in target_group_ids:
+                    member_id = member.getIdRef()
+                    if member_id not in target_group_ids:
                         new_member = target_group.createMember()
                         rpSBML.checklibSBML(new_member, 'Creating a new groups member')
-                        rpSBML.checklibSBML(new_member.setIdRef(member.getIdRef()), 'Setting name to the groups member')
+                        rpSBML.checklibSBML(new_member.setIdRef(member_id), 'Setting name to the groups member')
         ###### TITLES #####
-        target_rpsbml.getModel().setId(target_rpsbml.getModel().getId()+'__'+source_rpsbml.getModel().getId())
-        target_rpsbml.getModel().setName(target_rpsbml.getModel().getName()+' merged with '+source_rpsbml.getModel().getId())
+        target_model.setId(target_model.getId()+'__'+source_model.getId())
+        target_model.setName(target_model.getName()+' merged with '+source_model.getId())
         rpSBML._checkSingleParent(target_rpsbml, logger=logger)
         return species_source_target, reactions_source_target
 
@@ -572,7 +650,7 @@ class rpSBML:
         :rtype: bool
         :return: Success of failure of the function
         """
-        logger = logger or logging.getLogger(__name__)
+        logger = logger or _LOG
         rpgraph = rpGraph.rpGraph(rpsbml, True, pathway_id, central_species_group_id, sink_species_group_id, logger=logger)
         consumed_species_nid = rpgraph.onlyConsumedSpecies()
         produced_species_nid = rpgraph.onlyProducedSpecies()
@@ -614,71 +692,70 @@ class rpSBML:
 
 
     @staticmethod
-    def _findUniqueRowColumn(pd_matrix, logger=None):
+    def _findUniqueRowColumn(matrix, row_names, col_names, logger=None):
         """Private function that takes the matrix of similarity scores between the reactions or species of two models and finds the unqiue matches
 
-        pd_matrix is organised such that the rows are the simulated species and the columns are the measured ones
+        matrix is organised such that the rows are the simulated species and the columns are the measured ones
 
-        :param pd_matrix: Matrix of reactions or species of two models
+        :param matrix: Matrix of reactions or species of two models
+        :param row_names: The ids of the rows of the matrix
+        :param col_names: The ids of the columns of the matrix
 
-        :type pd_matrix: np.array
+        :type matrix: np.array
+        :type row_names: list
+        :type col_names: list
 
         :return: Dictionary of matches
         :rtype: dict
         """
-        logger = logger or logging.getLogger(__name__)
-        # self.logger.debug(pd_matrix)
+        logger = logger or _LOG
+        # self.logger.debug(matrix)
         to_ret = {}
+        # work on a rounded copy of the values and index back to the labels only for the returned matches,
+        # setting a row and column to 0.0 in place is the same as doing it on the matrix and rounding again
+        # resolve the rouding issues to find the max
+        x = np.around(np.array(matrix, dtype=np.float64).reshape((len(row_names), len(col_names))), decimals=5)
+        if not x.any():
+            return to_ret
         ######################## filter by the global top values ################
         # self.logger.debug('################ Filter best #############')
-        # transform to np.array
-        x = pd_matrix.values
-        # resolve the rouding issues to find the max
-        x = np.around(x, decimals=5)
         # first round involves finding the highest values and if found set to 0.0 the rows and columns (if unique)
-        top = np.where(x == np.max(x))
         # as long as its unique keep looping
-        if np.count_nonzero(x)==0:
-            return to_ret
-        while len(top[0])==1 and len(top[1])==1:
-            if np.count_nonzero(x)==0:
+        while True:
+            if not x.any():
                 return to_ret
-            pd_entry = pd_matrix.iloc[[top[0][0]],[top[1][0]]]
-            row_name = str(pd_entry.index[0])
-            col_name = str(pd_entry.columns[0])
+            top = x.argmax()
+            # a nan max never equals itself and stops the loop, as would a non unique max
+            if not np.count_nonzero(x==x.flat[top])==1:
+                break
+            top_row, top_col = divmod(int(top), x.shape[1])
             # if col_name in to_ret:
                 # self.logger.debug('Overwriting (1): '+str(col_name))
                 # self.logger.debug(x)
-            to_ret[col_name] = [row_name]
+            to_ret[str(col_names[top_col])] = [str(row_names[top_row])]
             # delete the rows and the columns
-            # self.logger.debug('==================')
-            # self.logger.debug('Column: '+str(col_name))
-            # self.logger.debug('Row: '+str(row_name))
-            pd_matrix.loc[:, col_name] = 0.0
-            pd_matrix.loc[row_name, :] = 0.0
-            x = pd_matrix.values
-            x = np.around(x, decimals=5)
-            top = np.where(x == np.max(x))
-            # self.logger.debug(pd_matrix)
-            # self.logger.debug(top)
-            # self.logger.debug('==================')
+            x[:, top_col] = 0.0
+            x[top_row, :] = 0.0
         #################### filter by columns (measured) top values ##############
         # self.logger.debug('################ Filter by column best ############')
-        x = pd_matrix.values
-        x = np.around(x, decimals=5)
-        if np.count_nonzero(x)==0:
-            return to_ret
         reloop = True
         while reloop:
-            if np.count_nonzero(x)==0:
+            if not x.any():
                 return to_ret
             reloop = False
-            for col in range(len(x[0])):
-                if np.count_nonzero(x[:,col])==0:
+            col_stats = None
+            for col in range(x.shape[1]):
+                # the number of non zero values, the number of maximum values and the row of the maximum of
+                # every column, computed at once and only again after a row and a column have been set to 0.0
+                if col_stats is None:
+                    col_stats = (np.count_nonzero(x, axis=0),
+                                 np.count_nonzero(x==x.max(axis=0), axis=0),
+                                 x.argmax(axis=0))
+                col_nonzero, col_num_max, col_top_row = col_stats
+                if col_nonzero[col]==0:
                     continue
-                top_row = np.where(x[:,col]==np.max(x[:,col]))[0]
-                if len(top_row)==1:
-                    top_row = top_row[0]
+                if col_num_max[col]==1:
+                    top_row = col_top_row[col]
                     # if top_row == 0.0:
                     #    continue
                     # check to see if any other measured pathways have the same or larger score (accross)
@@ -691,51 +768,31 @@ class rpSBML:
                         continue
                     # if you perform any changes on the rows and columns, then you can perform the loop again
                     reloop = True
-                    pd_entry = pd_matrix.iloc[[top_row],[col]]
-                    # self.logger.debug('==================')
-                    row_name = pd_entry.index[0]
-                    col_name = pd_entry.columns[0]
-                    # self.logger.debug('Column: '+str(col_name))
-                    # self.logger.debug('Row: '+str(row_name))
-                    # if col_name in to_ret:
-                        # self.logger.debug('Overwriting (2): '+str(col_name))
-                        # self.logger.debug(pd_matrix.values)
-                    to_ret[col_name] = [row_name]
+                    # self.logger.debug('Column: '+str(col_names[col]))
+                    # self.logger.debug('Row: '+str(row_names[top_row]))
+                    to_ret[col_names[col]] = [row_names[top_row]]
                     # delete the rows and the columns
-                    pd_matrix.loc[:, col_name] = 0.0
-                    pd_matrix.loc[row_name, :] = 0.0
-                    x = pd_matrix.values
-                    x = np.around(x, decimals=5)
-                    # self.logger.debug(pd_matrix)
-                    # self.logger.debug('==================')
+                    x[:, col] = 0.0
+                    x[top_row, :] = 0.0
+                    col_stats = None
         ################## laslty if there are multiple values that are not 0.0 then account for that ######
         # self.logger.debug('################# get the rest ##########')
-        x = pd_matrix.values
-        x = np.around(x, decimals=5)
-        if np.count_nonzero(x)==0:
+        if not x.any():
             return to_ret
-        for col in range(len(x[0])):
-            if not np.count_nonzero(x[:,col])==0:
-                top_rows = np.where(x[:,col]==np.max(x[:,col]))[0]
+        for col in range(x.shape[1]):
+            column = x[:,col]
+            if column.any():
+                top_rows = np.where(column==column.max())[0]
                 if len(top_rows)==1:
-                    top_row = top_rows[0]
-                    pd_entry = pd_matrix.iloc[[top_row],[col]]
-                    row_name = pd_entry.index[0]
-                    col_name = pd_entry.columns[0]
+                    col_name = col_names[col]
                     if col_name not in to_ret:
-                        to_ret[col_name] = [row_name]
+                        to_ret[col_name] = [row_names[top_rows[0]]]
                     else:
-                        logger.warning('At this point should never have only one: '+str(x[:,col]))
+                        logger.warning('At this point should never have only one: '+str(column))
                         logger.warning(x)
                 else:
                     for top_row in top_rows:
-                        pd_entry = pd_matrix.iloc[[top_row],[col]]
-                        row_name = pd_entry.index[0]
-                        col_name = pd_entry.columns[0]
-                        if col_name not in to_ret:
-                            to_ret[col_name] = []
-                        to_ret[col_name].append(row_name)
-        # self.logger.debug(pd_matrix)
+                        to_ret.setdefault(col_names[col], []).append(row_names[top_row])
         # self.logger.debug('###################')
         return to_ret
 
@@ -769,100 +826,82 @@ class rpSBML:
         # self.logger.debug('------ Comparing reactions --------')
         # match the reactants and products conversion to sim species
         tmp_reaction_match = {}
-        source_target = {}
-        target_source = {}
+        source_ids = []
+        source_scores = []
+        target_ids = [i.getId() for i in target_rpsbml.getModel().getListOfReactions()]
+        # best target species, and its score, of each source species that has a match
+        species_best = {spe: max(matches.items(), key=itemgetter(1)) for spe, matches in species_match.items() if matches}
         for source_reaction in source_rpsbml.getModel().getListOfReactions():
-            source_reaction_miriam = source_rpsbml.readMIRIAMAnnotation(source_reaction.getAnnotation())
             ################ construct the dict transforming the species #######
-            source_target[source_reaction.getId()] = {}
-            tmp_reaction_match[source_reaction.getId()] = {}
-            for target_reaction in target_rpsbml.getModel().getListOfReactions():
-                if not target_reaction.getId() in target_source:
-                    target_source[target_reaction.getId()] = {}
-                target_source[target_reaction.getId()][source_reaction.getId()] = {}
-                source_target[source_reaction.getId()][target_reaction.getId()] = {}
-                # self.logger.debug('\t=========== '+str(target_reaction.getId())+' ==========')
-                # self.logger.debug('\t+++++++ Species match +++++++')
-                tmp_reaction_match[source_reaction.getId()][target_reaction.getId()] = {'reactants': {},
-                                                                             'reactants_score': 0.0,
-                                                                             'products': {},
-                                                                             'products_score': 0.0,
-                                                                             'species_score': 0.0,
-                                                                             'species_std': 0.0,
-                                                                             'species_reaction': None,
-                                                                             'ec_score': 0.0,
-                                                                             'ec_reaction': None,
-                                                                             'score': 0.0,
-                                                                             'found': False}
-                target_reaction = target_rpsbml.getModel().getReaction(target_reaction.getId())
-                sim_reactants_id = [reactant.species for reactant in target_reaction.getListOfReactants()]
-                sim_products_id = [product.species for product in target_reaction.getListOfProducts()]
-                ############ species ############
-                # self.logger.debug('\tspecies_match: '+str(species_match))
-                # self.logger.debug('\tspecies_match: '+str(species_match.keys()))
-                # self.logger.debug('\tsim_reactants_id: '+str(sim_reactants_id))
-                # self.logger.debug('\tmeasured_reactants_id: '+str([i.species for i in source_reaction.getListOfReactants()]))
-                # self.logger.debug('\tsim_products_id: '+str(sim_products_id))
-                # self.logger.debug('\tmeasured_products_id: '+str([i.species for i in source_reaction.getListOfProducts()]))
-                # ensure that the match is 1:1
-                # 1)Here we assume that a reaction cannot have twice the same species
-                cannotBeSpecies = []
-                # if there is a match then we loop again since removing it from the list of potential matches would be appropriate
-                keep_going = True
-                while keep_going:
-                    # self.logger.debug('\t\t----------------------------')
-                    keep_going = False
-                    for reactant in source_reaction.getListOfReactants():
-                        # self.logger.debug('\t\tReactant: '+str(reactant.species))
-                        # if a species match has been found AND if such a match has been found
-                        founReaIDs = [tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants'][i]['id'] for i in tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants'] if not tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants'][i]['id']==None]
-                        # self.logger.debug('\t\tfounReaIDs: '+str(founReaIDs))
-                        if reactant.species and reactant.species in species_match and not list(species_match[reactant.species].keys())==[] and not reactant.species in founReaIDs:
-                            best_spe = [k for k, v in sorted(species_match[reactant.species].items(), key=lambda item: item[1], reverse=True)][0]
-                            tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants'][reactant.species] = {'id': best_spe, 'score': species_match[reactant.species][best_spe], 'found': True}
-                            cannotBeSpecies.append(best_spe)
-                        elif not reactant.species in tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants']:
-                            self.logger.warning('\t\tCould not find the following measured reactant in the matched species: '+str(reactant.species))
-                            tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants'][reactant.species] = {'id': None, 'score': 0.0, 'found': False}
-                    for product in source_reaction.getListOfProducts():
-                        # self.logger.debug('\t\tProduct: '+str(product.species))
-                        foundProIDs = [tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products'][i]['id'] for i in tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products'] if not tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products'][i]['id']==None]
-                        # self.logger.debug('\t\tfoundProIDs: '+str(foundProIDs))
-                        if product.species and product.species in species_match and not list(species_match[product.species].keys())==[] and not product.species in foundProIDs:
-                            best_spe = [k for k, v in sorted(species_match[product.species].items(), key=lambda item: item[1], reverse=True)][0]
-                            tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants'][product.species] = {'id': best_spe, 'score': species_match[product.species][best_spe], 'found': True}
-                            cannotBeSpecies.append(best_spe)
-                        elif not product.species in tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products']:
-                            self.logger.warning('\t\tCould not find the following measured product in the matched species: '+str(product.species))
-                            tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products'][product.species] = {'id': None, 'score': 0.0, 'found': False}
-                    # self.logger.debug('\t\tcannotBeSpecies: '+str(cannotBeSpecies))
-                reactants_score = [tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants'][i]['score'] for i in tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants']]
-                reactants_found = [tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants'][i]['found'] for i in tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants']]
-                tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['reactants_score'] = np.mean(reactants_score)
-                products_score = [tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products'][i]['score'] for i in tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products']]
-                products_found = [tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products'][i]['found'] for i in tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products']]
-                tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['products_score'] = np.mean(products_score)
-                ### calculate pathway species score
-                tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['species_score'] = np.mean(reactants_score+products_score)
-                tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['species_std'] = np.std(reactants_score+products_score)
-                tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['species_reaction'] = target_reaction.getId()
-                tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['found'] = all(reactants_found+products_found)
-                tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['score'] = tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['species_score']
-                target_source[target_reaction.getId()][source_reaction.getId()] = tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['score']
-                source_target[source_reaction.getId()][target_reaction.getId()] = tmp_reaction_match[source_reaction.getId()][target_reaction.getId()]['score']
+            # the species of the source reaction are matched through species_match only, this does not depend
+            # on the target reaction and is done once per source reaction instead of once per pair
+            species_reaction_match = _ReactionMatch()
+            ############ species ############
+            # self.logger.debug('\tspecies_match: '+str(species_match))
+            # self.logger.debug('\tspecies_match: '+str(species_match.keys()))
+            # self.logger.debug('\tmeasured_reactants_id: '+str([i.species for i in source_reaction.getListOfReactants()]))
+            # self.logger.debug('\tmeasured_products_id: '+str([i.species for i in source_reaction.getListOfProducts()]))
+            # ensure that the match is 1:1
+            # 1)Here we assume that a reaction cannot have twice the same species
+            # ids of the target species matched so far
+            found_reactant_ids = set()
+            for reactant in source_reaction.getListOfReactants():
+                reactant_id = reactant.species
+                # self.logger.debug('\t\tReactant: '+str(reactant_id))
+                # if a species match has been found AND if such a match has been found
+                # self.logger.debug('\t\tfound_reactant_ids: '+str(found_reactant_ids))
+                if reactant_id and reactant_id in species_best and not reactant_id in found_reactant_ids:
+                    best_spe, best_score = species_best[reactant_id]
+                    species_reaction_match.reactants[reactant_id] = {'id': best_spe, 'score': best_score, 'found': True}
+                    found_reactant_ids.add(best_spe)
+                elif not reactant_id in species_reaction_match.reactants:
+                    self.logger.warning('\t\tCould not find the following measured reactant in the matched species: '+str(reactant_id))
+                    species_reaction_match.reactants[reactant_id] = {'id': None, 'score': 0.0, 'found': False}
+            for product in source_reaction.getListOfProducts():
+                product_id = product.species
+                # self.logger.debug('\t\tProduct: '+str(product_id))
+                # NOTE: the matched products are recorded with the reactants, and the check on the products already
+                # matched only looked at the products, so it never excluded a product and is not done
+                if product_id and product_id in species_best:
+                    best_spe, best_score = species_best[product_id]
+                    species_reaction_match.reactants[product_id] = {'id': best_spe, 'score': best_score, 'found': True}
+                elif not product_id in species_reaction_match.products:
+                    self.logger.warning('\t\tCould not find the following measured product in the matched species: '+str(product_id))
+                    species_reaction_match.products[product_id] = {'id': None, 'score': 0.0, 'found': False}
+            reactants_score = [species_reaction_match.reactants[i]['score'] for i in species_reaction_match.reactants]
+            reactants_found = [species_reaction_match.reactants[i]['found'] for i in species_reaction_match.reactants]
+            products_score = [species_reaction_match.products[i]['score'] for i in species_reaction_match.products]
+            products_found = [species_reaction_match.products[i]['found'] for i in species_reaction_match.products]
+            ### calculate pathway species score
+            species_score = rpSBML._mean(reactants_score+products_score)
+            species_reaction_match.reactants_score = rpSBML._mean(reactants_score)
+            species_reaction_match.products_score = rpSBML._mean(products_score)
+            species_reaction_match.species_score = species_score
+            species_reaction_match.species_std = rpSBML._std(reactants_score+products_score)
+            species_reaction_match.found = all(reactants_found+products_found)
+            species_reaction_match.score = species_score
+            source_id = source_reaction.getId()
+            # the match is the same for all the target reactions
+            tmp_reaction_match[source_id] = species_reaction_match
+            source_ids.append(source_id)
+            source_scores.append(species_score)
         ### matrix compare #####
-        unique = rpSBML._findUniqueRowColumn(pd_DataFrame(source_target), self.logger)
+        # the rows are the target reactions and the columns the source ones, the score of a pair is the one of its source reaction
+        # a source reaction without any species in species_match has a column of 0.0 that _findUniqueRowColumn never selects,
+        # there is no per target work left to skip for it
+        score_matrix = np.tile(np.array(source_scores, dtype=np.float64), (len(target_ids), 1))
+        unique = rpSBML._findUniqueRowColumn(score_matrix, target_ids, source_ids, self.logger)
         # self.logger.debug('findUniqueRowColumn')
         # self.logger.debug(unique)
         reaction_match = {}
-        for meas in source_target:
+        for meas in source_ids:
             reaction_match[meas] = {'id': None, 'score': 0.0, 'found': False}
             if meas in unique:
                 # if len(unique[meas])>1:
                     # self.logger.debug('Multiple values may match, choosing the first arbitrarily: '+str(unique))
                 reaction_match[meas]['id'] = unique[meas]
-                reaction_match[meas]['score'] = round(tmp_reaction_match[meas][unique[meas][0]]['score'], 5)
-                reaction_match[meas]['found'] = tmp_reaction_match[meas][unique[meas][0]]['found']
+                reaction_match[meas]['score'] = round(tmp_reaction_match[meas].score, 5)
+                reaction_match[meas]['found'] = tmp_reaction_match[meas].found
         #### compile a reaction score based on the ec and species scores
         # self.logger.debug(tmp_reaction_match)
         # self.logger.debug(reaction_match)
@@ -893,15 +932,18 @@ class rpSBML:
         """
         scores = []
         all_match = True
+        # read the species of the target reaction once instead of for every source species
+        target_reactants = [i.species for i in target_reaction.getListOfReactants()]
+        target_products = [i.species for i in target_reaction.getListOfProducts()]
         ########### reactants #######
         ignore_reactants = []
         for source_reactant in source_reaction.getListOfReactants():
             if source_reactant.species in species_source_target:
                 spe_found = False
-                for target_reactiontant in target_reaction.getListOfReactants():
-                    if target_reactiontant.species in species_source_target[source_reactant.species] and not target_reactiontant.species in ignore_reactants:
-                        scores.append(species_source_target[source_reactant.species][target_reactiontant.species])
-                        ignore_reactants.append(target_reactiontant.species)
+                for target_reactant in target_reactants:
+                    if target_reactant in species_source_target[source_reactant.species] and not target_reactant in ignore_reactants:
+                        scores.append(species_source_target[source_reactant.species][target_reactant])
+                        ignore_reactants.append(target_reactant)
                         spe_found = True
                         break
                 if not spe_found:
@@ -916,10 +958,10 @@ class rpSBML:
         for source_product in source_reaction.getListOfProducts():
             if source_product.species in species_source_target:
                 pro_found = False
-                for sim_product in target_reaction.getListOfProducts():
-                    if sim_product.species in species_source_target[source_product.species] and not sim_product.species in ignore_products:
-                        scores.append(species_source_target[source_product.species][sim_product.species])
-                        ignore_products.append(sim_product.species)
+                for target_product in target_products:
+                    if target_product in species_source_target[source_product.species] and not target_product in ignore_products:
+                        scores.append(species_source_target[source_product.species][target_product])
+                        ignore_products.append(target_product)
                         pro_found = True
                         break
                 if not pro_found:
@@ -929,14 +971,94 @@ class rpSBML:
                 # self.logger.debug('Cannot find the measured species '+str(source_product.species)+' in the the matched species: '+str(species_source_target))
                 scores.append(0.0)
                 all_match = False
-        return np.mean(scores), all_match
+        return rpSBML._mean(scores), all_match
+
+
+    @staticmethod
+    def _reactionKey(reactants, products):
+        """Return a key of the species of a reaction, equal for two reactions that have the same reactants and products whatever their order
+
+        :param reactants: The ids of the reactants
+        :param products: The ids of the products
+
+        :type reactants: list
+        :type products: list
+
+        :return: The sorted reactants and the sorted products
+        :rtype: tuple
+        """
+        return tuple(sorted(reactants)), tuple(sorted(products))
+
+
+    @staticmethod
+    def _indexReaction(species_source_target, target_reaction, target_reactions_index):
+        """Add a target reaction to the index used to match the source reactions
+
+        The reactants and products of the target reaction are converted to their matched species as in
+        compareReaction, and the reaction is indexed by their _reactionKey. The first reaction indexed under a key is kept
+
+        :param species_source_target: The comparison dictionary between the species of two SBML files
+        :param target_reaction: The target reaction
+        :param target_reactions_index: The id of the first indexed target reaction of each key
+
+        :type species_source_target: dict
+        :type target_reaction: libsbml.Reaction
+        :type target_reactions_index: dict
+
+        :return: None
+        :rtype: None
+        """
+        key = rpSBML._reactionKey([rpSBML._convertSpecies(i.species, species_source_target)[0] for i in target_reaction.getListOfReactants()],
+                                  [rpSBML._convertSpecies(i.species, species_source_target)[0] for i in target_reaction.getListOfProducts()])
+        target_reactions_index.setdefault(key, target_reaction.getId())
+
+
+    @staticmethod
+    def _findReactionMatch(source_reaction, target_reactions_index):
+        """Return the id of the first indexed target reaction that compareReaction elects to be the same as the source reaction
+
+        :param source_reaction: The source reaction
+        :param target_reactions_index: The id of the first indexed target reaction of each key
+
+        :type source_reaction: libsbml.Reaction
+        :type target_reactions_index: dict
+
+        :return: The id of the target reaction or None if there is no match
+        :rtype: str
+        """
+        return target_reactions_index.get(rpSBML._reactionKey([i.species for i in source_reaction.getListOfReactants()],
+                                                              [i.species for i in source_reaction.getListOfProducts()]))
+
+
+    @staticmethod
+    def _convertSpecies(species_id, species_source_target):
+        """Return the species matched with a species and the score of the match
+
+        :param species_id: The species id
+        :param species_source_target: The comparison dictionary between the species of two SBML files
+
+        :type species_id: str
+        :type species_source_target: dict
+
+        :return: The matched species id and the score, or the species id itself and 1.0 if it was not matched
+        :rtype: tuple
+        """
+        matches = species_source_target.get(species_id)
+        if matches:
+            # WARNING: Taking the first one arbitrarely
+            conv_spe = next(iter(matches))
+            return conv_spe, matches[conv_spe]
+        return species_id, 1.0
 
 
-    #TODO: change this with a flag so that all the reactants and products are the same
     @staticmethod
     def compareReaction(species_source_target, source_reaction, target_reaction, logger=None):
         """Compare two reactions and elect that they are the same if they have exactly the same reactants and products
 
+        The species of the target reaction are converted to their matched species before the comparison, and each
+        species counts as many times as it appears in the reaction. See containedReaction to test if the source reaction
+        is contained within the target one
+
         species_source_target: {'MNXM4__64__MNXC3': {'M_o2_c': 1.0}, 'MNXM10__64__MNXC3': {'M_nadh_c': 1.0}, 'CMPD_0000000003__64__MNXC3': {}, 'TARGET_0000000001__64__MNXC3': {}, 'MNXM188__64__MNXC3': {'M_anth_c': 1.0}, 'BC_32877__64__MNXC3': {'M_nh4_c': 0.8}, 'BC_32401__64__MNXC3': {'M_nad_c': 0.2}, 'BC_26705__64__MNXC3': {'M_h_c': 1.0}, 'BC_20662__64__MNXC3': {'M_co2_c': 1.0}}
         the first keys are the source compartment ids
         the second key is the source species id
@@ -944,8 +1066,8 @@ class rpSBML:
         Note that we assure that the match is 1:1 between species using the species match
 
         :param species_source_target: The comparison dictionary between the species of two SBML files
-        :param source_reaction: The target reaction
-        :param target_reaction: The source reaction
+        :param source_reaction: The source reaction
+        :param target_reaction: The target reaction
 
         :type species_source_target: dict
         :type source_reaction: libsbml.Reaction
@@ -954,38 +1076,14 @@ class rpSBML:
         :return: The score of the match and boolean if its a match or not
         :rtype: tuple
         """
-        logger = logger or logging.getLogger(__name__)
-        scores = []
+        logger = logger or _LOG
         source_reactants = [i.species for i in source_reaction.getListOfReactants()]
-        target_reactants = []
-        for i in target_reaction.getListOfReactants():
-            if i.species in species_source_target:
-                if not species_source_target[i.species]=={}:
-                    # WARNING: Taking the first one arbitrarely
-                    conv_spe = [y for y in species_source_target[i.species]][0]
-                    target_reactants.append(conv_spe)
-                    scores.append(species_source_target[i.species][conv_spe])
-                else:
-                    target_reactants.append(i.species)
-                    scores.append(1.0)
-            else:
-                target_reactants.append(i.species)
-                scores.append(1.0)
         source_products = [i.species for i in source_reaction.getListOfProducts()]
-        target_products = []
-        for i in target_reaction.getListOfReactants():
-            if i.species in species_source_target:
-                if not species_source_target[i.species]=={}:
-                    # WARNING: Taking the first one arbitrarely
-                    conv_spe = [y for y in species_source_target[i.species]][0]
-                    target_products.append(conv_spe)
-                    scores.append(species_source_target[i.species][conv_spe])
-                else:
-                    target_products.append(i.species)
-                    scores.append(1.0)
-            else:
-                target_products.append(i.species)
-                scores.append(1.0)
+        target_reactants = [rpSBML._convertSpecies(i.species, species_source_target) for i in target_reaction.getListOfReactants()]
+        target_products = [rpSBML._convertSpecies(i.species, species_source_target) for i in target_reaction.getListOfProducts()]
+        scores = [i[1] for i in target_reactants]+[i[1] for i in target_products]
+        target_reactants = [i[0] for i in target_reactants]
+        target_products = [i[0] for i in target_products]
         '''
         # self.logger.debug('source_reactants: '+str(source_reactants))
         # self.logger.debug('target_reactants: '+str(target_reactants))
@@ -995,10 +1093,12 @@ class rpSBML:
         # self.logger.debug(set(source_products)-set(target_products))
         '''
 
-        if not set(source_reactants)-set(target_reactants) and not set(source_products)-set(target_products):
-            return np.mean(scores), True
+        # compare the sorted species only if the numbers of reactants and products are the same
+        if len(source_reactants)==len(target_reactants) and len(source_products)==len(target_products) \
+                and rpSBML._reactionKey(source_reactants, source_products)==rpSBML._reactionKey(target_reactants, target_products):
+            return rpSBML._mean(scores), True
         else:
-            return np.mean(scores), False
+            return rpSBML._mean(scores), False
 
 
     ##########################################################################################
@@ -1006,6 +1106,43 @@ class rpSBML:
     ##########################################################################################
 
 
+    def _speciesFeatures(self):
+        """Return the features of the species of the model that compareSpecies compares
+
+        The InChIKey of a species is the one of its BRSynth annotation, or else the first one of its MIRIAM annotation
+
+        :rtype: tuple
+        :return: The lists of the species ids, compartment ids, sets of the MIRIAM (database, id) pairs and InChIKey layers (None if there is no InChIKey)
+        """
+        ids = []
+        compartments = []
+        miriam_keys = []
+        inchikeys = []
+        for species in self.getModel().getListOfSpecies():
+            annot = species.getAnnotation()
+            brsynth_annot = self.readBRSYNTHAnnotation(annot, self.logger)
+            miriam_annot = self.readMIRIAMAnnotation(annot)
+            ids.append(species.getId())
+            compartments.append(species.getCompartment())
+            miriam_keys.append({(dbid, cid) for dbid, cids in miriam_annot.items() for cid in cids})
+            # NOTE: here we prioritise the BRSynth annotation inchikey over the MIRIAM
+            inchikey = None
+            if 'inchikey' in brsynth_annot:
+                inchikey = brsynth_annot['inchikey']
+            elif 'inchikey' in miriam_annot:
+                if not len(miriam_annot['inchikey'])==1:
+                    # TODO: handle mutliple inchikey with mutliple compare and the highest comparison value kept
+                    self.logger.warning('There are multiple inchikey values, taking the first one: '+str(miriam_annot['inchikey']))
+                inchikey = miriam_annot['inchikey'][0]
+            if inchikey is None:
+                inchikeys.append(None)
+            else:
+                # pad the missing layers so that they never match
+                inchikey_split = inchikey.split('-')
+                inchikeys.append(tuple(inchikey_split[:3])+(None,)*(3-len(inchikey_split)))
+        return ids, compartments, miriam_keys, inchikeys
+
+
     # TODO: for all the measured species compare with the simualted one. Then find the measured and simulated species that match the best and exclude the
     # simulated species from potentially matching with another
     @staticmethod
@@ -1023,83 +1160,78 @@ class rpSBML:
         :return: The compartment match dictionary
         :rtype: dict
         """
-        logger = logger or logging.getLogger(__name__)
+        logger = logger or _LOG
         ############## compare species ###################
-        source_target = {}
-        target_source = {}
-        species_match = {}
-        for source_species in source_rpsbml.getModel().getListOfSpecies():
-            # self.logger.debug('--- Trying to match chemical species: '+str(source_species.getId())+' ---')
-            source_target[source_species.getId()] = {}
-            species_match[source_species.getId()] = {}
-            # species_match[source_species.getId()] = {'id': None, 'score': 0.0, 'found': False}
-            # TODO: need to exclude from the match if a simulated chemical species is already matched with a higher score to another measured species
-            for target_species in target_rpsbml.getModel().getListOfSpecies():
-                # skip the species that are not in the same compartment as the source
-                if not target_species.getCompartment()==comp_source_target[source_species.getCompartment()]:
-                    continue
-                source_target[source_species.getId()][target_species.getId()] = {'score': 0.0, 'found': False}
-                if not target_species.getId() in target_source:
-                    target_source[target_species.getId()] = {}
-                target_source[target_species.getId()][source_species.getId()] = {'score': 0.0, 'found': False}
-                source_brsynth_annot = target_rpsbml.readBRSYNTHAnnotation(source_species.getAnnotation(), target_rpsbml.logger)
-                target_brsynth_annot = target_rpsbml.readBRSYNTHAnnotation(target_species.getAnnotation(), target_rpsbml.logger)
-                source_miriam_annot = target_rpsbml.readMIRIAMAnnotation(source_species.getAnnotation())
-                target_miriam_annot = target_rpsbml.readMIRIAMAnnotation(target_species.getAnnotation())
-                #### MIRIAM ####
-                if target_rpsbml.compareMIRIAMAnnotations(source_species.getAnnotation(), target_species.getAnnotation()):
-                    # self.logger.debug('--> Matched MIRIAM: '+str(target_species.getId()))
-                    source_target[source_species.getId()][target_species.getId()]['score'] += 0.4
-                    # source_target[source_species.getId()][target_species.getId()]['score'] += 0.2+0.2*jaccardMIRIAM(target_miriam_annot, source_miriam_annot)
-                    source_target[source_species.getId()][target_species.getId()]['found'] = True
-                ##### InChIKey ##########
-                # find according to the inchikey -- allow partial matches
-                # compare either inchikey in brsynth annnotation or MIRIAM annotation
-                # NOTE: here we prioritise the BRSynth annotation inchikey over the MIRIAM
-                source_inchikey_split = None
-                target_inchikey_split = None
-                if 'inchikey' in source_brsynth_annot:
-                    source_inchikey_split = source_brsynth_annot['inchikey'].split('-')
-                elif 'inchikey' in source_miriam_annot:
-                    if not len(source_miriam_annot['inchikey'])==1:
-                        # TODO: handle mutliple inchikey with mutliple compare and the highest comparison value kept
-                        logger.warning('There are multiple inchikey values, taking the first one: '+str(source_miriam_annot['inchikey']))
-                    source_inchikey_split = source_miriam_annot['inchikey'][0].split('-')
-                if 'inchikey' in target_brsynth_annot:
-                    target_inchikey_split = target_brsynth_annot['inchikey'].split('-')
-                elif 'inchikey' in target_miriam_annot:
-                    if not len(target_miriam_annot['inchikey'])==1:
-                        # TODO: handle mutliple inchikey with mutliple compare and the highest comparison value kept
-                        logger.warning('There are multiple inchikey values, taking the first one: '+str(target_brsynth_annot['inchikey']))
-                    target_inchikey_split = target_miriam_annot['inchikey'][0].split('-')
-                if source_inchikey_split and target_inchikey_split:
-                    if source_inchikey_split[0]==target_inchikey_split[0]:
-                        # self.logger.debug('Matched first layer InChIkey: ('+str(source_inchikey_split)+' -- '+str(target_inchikey_split)+')')
-                        source_target[source_species.getId()][target_species.getId()]['score'] += 0.2
-                        if source_inchikey_split[1]==target_inchikey_split[1]:
-                            # self.logger.debug('Matched second layer InChIkey: ('+str(source_inchikey_split)+' -- '+str(target_inchikey_split)+')')
-                            source_target[source_species.getId()][target_species.getId()]['score'] += 0.2
-                            source_target[source_species.getId()][target_species.getId()]['found'] = True
-                            if source_inchikey_split[2]==target_inchikey_split[2]:
-                                # self.logger.debug('Matched third layer InChIkey: ('+str(source_inchikey_split)+' -- '+str(target_inchikey_split)+')')
-                                source_target[source_species.getId()][target_species.getId()]['score'] += 0.2
-                                source_target[source_species.getId()][target_species.getId()]['found'] = True
-                target_source[target_species.getId()][source_species.getId()]['score'] = source_target[source_species.getId()][target_species.getId()]['score']
-                target_source[target_species.getId()][source_species.getId()]['found'] = source_target[source_species.getId()][target_species.getId()]['found']
-        # build the matrix to send
-        source_target_mat = {}
-        for i in source_target:
-            source_target_mat[i] = {}
-            for y in source_target[i]:
-                source_target_mat[i][y] = source_target[i][y]['score']
-        unique = rpSBML._findUniqueRowColumn(pd_DataFrame(source_target_mat), logger=logger)
+        #the annotations of every species are read once, the pairs are then scored at once in a (source, target) matrix
+        source_ids, source_comps, source_miriam, source_inchikeys = source_rpsbml._speciesFeatures()
+        target_ids, target_comps, target_miriam, target_inchikeys = target_rpsbml._speciesFeatures()
+        species_match = {i: {} for i in source_ids}
+        # only the pairs of species in the same compartment are compared, as the target species in the compartment
+        # matched with the one of the source species, the species are bucketed by (target) compartment and only
+        # the pairs within a bucket are scored
+        source_by_comp = defaultdict(list)
+        for source_pos, comp in enumerate(source_comps):
+            source_by_comp[comp_source_target[comp]].append(source_pos)
+        target_by_comp = defaultdict(list)
+        for target_pos, comp in enumerate(target_comps):
+            target_by_comp[comp].append(target_pos)
+        same_comp = np.zeros((len(source_ids), len(target_ids)), dtype=bool)
+        scores = np.zeros((len(source_ids), len(target_ids)), dtype=np.float64)
+        # encode the InChIKey layers as integers, a layer has the same code in both models and the missing
+        # layers of the source (-1) and of the target (-2) never match
+        source_layers = []
+        target_layers = []
+        for layer in range(3):
+            layer_codes = {}
+            source_layers.append(np.array([layer_codes.setdefault(i[layer], len(layer_codes)) if i and i[layer] is not None else -1
+                                           for i in source_inchikeys], dtype=np.int64))
+            target_layers.append(np.array([layer_codes.setdefault(i[layer], len(layer_codes)) if i and i[layer] is not None else -2
+                                           for i in target_inchikeys], dtype=np.int64))
+        for comp, comp_source_pos in source_by_comp.items():
+            comp_target_pos = target_by_comp.get(comp)
+            if not comp_target_pos:
+                continue
+            block = np.ix_(comp_source_pos, comp_target_pos)
+            same_comp[block] = True
+            #### MIRIAM ####
+            # the positions, within the bucket, of the target species that have each (database, id) pair
+            target_miriam_index = defaultdict(list)
+            for block_pos, target_pos in enumerate(comp_target_pos):
+                for miriam_key in target_miriam[target_pos]:
+                    target_miriam_index[miriam_key].append(block_pos)
+            miriam_match = np.zeros((len(comp_source_pos), len(comp_target_pos)), dtype=bool)
+            for block_pos, source_pos in enumerate(comp_source_pos):
+                for miriam_key in source_miriam[source_pos]:
+                    miriam_match[block_pos, target_miriam_index.get(miriam_key, [])] = True
+            block_scores = np.where(miriam_match, 0.4, 0.0)
+            # block_scores += 0.2+0.2*jaccardMIRIAM(target_miriam_annot, source_miriam_annot)
+            ##### InChIKey ##########
+            # find according to the inchikey -- allow partial matches, a layer only counts if the previous ones match
+            # the scores are updated in place, and the next layers are skipped once no pair matches
+            layer_match = np.ones(miriam_match.shape, dtype=bool)
+            for source_layer, target_layer in zip(source_layers, target_layers):
+                layer_match &= source_layer[comp_source_pos][:, None]==target_layer[comp_target_pos][None, :]
+                if not layer_match.any():
+                    break
+                np.add(block_scores, 0.2, out=block_scores, where=layer_match)
+            scores[block] = block_scores
+        # build the matrix to send, the rows are the target species in the order they are first compared with a
+        # source species (the buckets in the order of their first source species) and the columns the source
+        # species, the pairs that are not compared are nan
+        rows = []
+        for comp in source_by_comp:
+            rows.extend(target_by_comp.get(comp, []))
+        source_target_mat = np.where(same_comp, scores, np.nan)[:, rows].T
+        unique = rpSBML._findUniqueRowColumn(source_target_mat, [target_ids[i] for i in rows], source_ids, logger=logger)
         # self.logger.debug('findUniqueRowColumn:')
         # self.logger.debug(unique)
-        for meas in source_target:
+        # only the scores of the unique matches are read back from the matrix
+        target_index = {target_id: target_pos for target_pos, target_id in enumerate(target_ids)}
+        for source_pos, meas in enumerate(source_ids):
             if meas in unique:
                 species_match[meas] = {}
                 for unique_spe in unique[meas]:
-                    species_match[meas][unique_spe] = round(source_target[meas][unique[meas][0]]['score'], 5)
+                    species_match[meas][unique_spe] = round(float(scores[source_pos, target_index[unique[meas][0]]]), 5)
             else:
                 logger.warning('Cannot find a species match for the measured species: '+str(meas))
         # self.logger.debug('#########################')
@@ -1128,41 +1260,51 @@ class rpSBML:
         """
         # Warning we only match a single reaction at a time -- assume that there cannot be more than one to match at a given time
         if 'ec-code' in meas_reac_miriam and 'ec-code' in sim_reac_miriam:
-            measured_frac_ec = [[y for y in ec.split('.') if not y=='-'] for ec in meas_reac_miriam['ec-code']]
-            sim_frac_ec = [[y for y in ec.split('.') if not y=='-'] for ec in sim_reac_miriam['ec-code']]
-            # complete the ec numbers with None to be length of 4
-            for i in range(len(measured_frac_ec)):
-                for y in range(len(measured_frac_ec[i]), 4):
-                    measured_frac_ec[i].append(None)
-            for i in range(len(sim_frac_ec)):
-                for y in range(len(sim_frac_ec[i]), 4):
-                    sim_frac_ec[i].append(None)
+            # split the ec numbers once, completed with None to be length of 4, the duplicates are compared only once
+            measured_frac_ec = {rpSBML._splitEC(ec) for ec in meas_reac_miriam['ec-code']}
+            sim_frac_ec = {rpSBML._splitEC(ec) for ec in sim_reac_miriam['ec-code']}
             # self.logger.debug('Measured: ')
             # self.logger.debug(measured_frac_ec)
             # self.logger.debug('Simulated: ')
             # self.logger.debug(sim_frac_ec)
-            best_ec_compare = {'meas_ec': [], 'sim_ec': [], 'score': 0.0, 'found': False}
+            best_score = 0.0
             for ec_m in measured_frac_ec:
                 for ec_s in sim_frac_ec:
                     tmp_score = 0.0
-                    for i in range(4):
-                        if not ec_m[i]==None and not ec_s[i]==None:
-                            if ec_m[i]==ec_s[i]:
+                    for m, s in zip(ec_m, ec_s):
+                        if m is not None and s is not None:
+                            if m==s:
                                 tmp_score += 0.25
-                                if i == 2:
-                                    best_ec_compare['found'] = True
                             else:
                                 break
-                    if tmp_score>best_ec_compare['score']:
-                        best_ec_compare['meas_ec'] = ec_m
-                        best_ec_compare['sim_ec'] = ec_s
-                        best_ec_compare['score'] = tmp_score
-            return best_ec_compare['score']
+                    if tmp_score>best_score:
+                        best_score = tmp_score
+                        # no other pair can do better than a full match
+                        if best_score==1.0:
+                            return best_score
+            return best_score
         else:
             self.logger.warning('One of the two reactions does not have any EC entries.\nMeasured: '+str(meas_reac_miriam)+' \nSimulated: '+str(sim_reac_miriam))
             return 0.0
 
 
+    @staticmethod
+    def _splitEC(ec):
+        """Return the levels of an EC number as compared by compareEC
+
+        The undefined levels ('-') are dropped and the EC number is completed with None to be of length 4
+
+        :param ec: The EC number
+
+        :type ec: str
+
+        :rtype: tuple
+        :return: The 4 levels of the EC number
+        """
+        levels = [y for y in ec.split('.') if not y=='-'][:4]
+        return tuple(levels)+(None,)*(4-len(levels))
+
+
     @staticmethod
     def _search_key(keys, dict):
         for key in keys:
@@ -1177,27 +1319,32 @@ class rpSBML:
     @staticmethod
     def _normalize_pathway(pathway, logger=None):
 
-        logger = logger or logging.getLogger(__name__)
+        logger = logger or _LOG
 
         model = pathway.document.getModel()
 
         # Get Reactions
         reactions = {}
         for reaction_id in pathway.readRPpathwayIDs():
-            reaction = model.getReaction(reaction_id)
-            reactions[reaction_id] = rpSBML.readBRSYNTHAnnotation(reaction.getAnnotation(), logger=logger)
+            reactions[reaction_id] = model.getReaction(reaction_id)
 
-        # Get Species
-        species = {}
-        for specie in model.getListOfSpecies():
-            species[specie.getId()] = rpSBML.readBRSYNTHAnnotation(specie.getAnnotation(), logger=logger)
+        # Get the Species of these reactions only, with the identifier they are compared on: inchikey / inchi / smiles
+        # of the BRSynth annotation, or else the id
+        keys = ['inchikey', 'inchi', 'smiles']
+        species_key = {}
+        for reaction in reactions.values():
+            for specie_ref in list(reaction.getListOfReactants())+list(reaction.getListOfProducts()):
+                specie_id = specie_ref.getSpecies()
+                if specie_id not in species_key:
+                    brsynth_annot = rpSBML.readBRSYNTHAnnotation(model.getSpecies(specie_id).getAnnotation(), logger=logger)
+                    key = rpSBML._search_key(keys, brsynth_annot)
+                    species_key[specie_id] = brsynth_annot[key] if key else specie_id
 
         # Pathways dict
         d_reactions = {}
 
-        keys = ['inchikey', 'inchi', 'smiles']
         # Select Reactions already loaded (w/o Sink one then)
-        for reaction_id in reactions:
+        for reaction_id, reaction in reactions.items():
 
             # id = reactions[reaction]['smiles']
             id = reaction_id
@@ -1206,24 +1353,16 @@ class rpSBML:
 
             # Fill the reactants in a dedicated dict
             d_reactants = {}
-            for reactant in model.getReaction(reaction_id).getListOfReactants():# inchikey / inchi sinon miriam sinon IDs
+            for reactant in reaction.getListOfReactants():# inchikey / inchi sinon miriam sinon IDs
                 # Il faut enregistrer toutes les infos (inchi, smiles, id)
-                key = rpSBML._search_key(keys, species[reactant.getSpecies()])
-                if key: key = species[reactant.getSpecies()][key]
-                else:
-                    key = reactant.getSpecies()
-                d_reactants[key] = reactant.getStoichiometry()
+                d_reactants[species_key[reactant.getSpecies()]] = reactant.getStoichiometry()
             # Put all reactants dicts in reactions dict for which smiles notations are the keys
             d_reactions[reaction_id]['Reactants'] = d_reactants
 
             # Fill the products in a dedicated dict
             d_products = {}
-            for product in model.getReaction(reaction_id).getListOfProducts():
-                key = rpSBML._search_key(keys, species[product.getSpecies()])
-                if key: key = species[product.getSpecies()][key]
-                else:
-                    key = product.getSpecies()
-                d_products[key] = product.getStoichiometry()
+            for product in reaction.getListOfProducts():
+                d_products[species_key[product.getSpecies()]] = product.getStoichiometry()
             # Put all products dicts in reactions dict for which smiles notations are the keys
             d_reactions[reaction_id]['Products'] = d_products
 
@@ -1237,9 +1376,9 @@ class rpSBML:
 
     def __eq__(self, other):
             # len(self.getModel().getListOfReactions())==len(other.getModel().getListOfReactions()) \
-        return \
+        return self is other or ( \
             sorted(self.readRPpathwayIDs()) == sorted(other.readRPpathwayIDs()) \
-        and rpSBML._normalize_pathway(self, self.logger) == rpSBML._normalize_pathway(other, self.logger)
+        and rpSBML._normalize_pathway(self, self.logger) == rpSBML._normalize_pathway(other, self.logger))
 
     def __lt__(self, rpsbml):
         return self.getScore() < rpsbml.getScore()
@@ -1276,7 +1415,7 @@ class rpSBML:
         :return: None
         :rtype: None
         """
-        logger = logger or logging.getLogger(__name__)
+        logger = logger or _LOG
         if value is None:
            raise SystemExit('LibSBML returned a null value trying to ' + message + '.')
         elif type(value) is int:
@@ -1306,18 +1445,93 @@ class rpSBML:
         #     return None
 
 
+    @staticmethod
+    def checklibSBMLList(values, messages, logger=None):
+        """Check the returned values of a sequence of libSBML calls at once
+
+        The values are only checked one by one with checklibSBML if one of them is not a success
+
+        :param values: The libSBML commands returned int
+        :param messages: The strings that describe each call
+
+        :type values: tuple
+        :type messages: tuple
+
+        :raises SystemExit: If one of the libSBML commands encountered an error or returned None
+
+        :return: None
+        :rtype: None
+        """
+        if all(value==libsbml.LIBSBML_OPERATION_SUCCESS for value in values):
+            return
+        for value, message in zip(values, messages):
+            rpSBML.checklibSBML(value, message, logger=logger)
+
+
+    @staticmethod
+    def _mean(values):
+        """Return the mean of a short list of values, without the overhead of np.mean
+
+        :param values: The values
+
+        :type values: list
+
+        :return: The mean of the values, nan if there are none as with np.mean
+        :rtype: float
+        """
+        if not values:
+            return float('nan')
+        return sum(values)/len(values)
+
+
+    @staticmethod
+    def _std(values):
+        """Return the (population) standard deviation of a short list of values, without the overhead of np.std
+
+        :param values: The values
+
+        :type values: list
+
+        :return: The standard deviation of the values, nan if there are none as with np.std
+        :rtype: float
+        """
+        if not values:
+            return float('nan')
+        mean = sum(values)/len(values)
+        return sqrt(sum((value-mean)**2 for value in values)/len(values))
+
+
+    @staticmethod
+    def _walkAnnotation(annot, names):
+        """Return the XML node reached by following the children names from an annotation
+
+        :param annot: The annotation object of libSBML
+        :param names: The names of the successive children
+
+        :type annot: libsbml.XMLNode
+        :type names: tuple
+
+        :return: The child node, empty if one of the children does not exist
+        :rtype: libsbml.XMLNode
+        """
+        node = annot
+        for name in names:
+            node = node.getChild(name)
+        return node
+
+
     def convertToCobra(self):
         """Convert the rpSBML object to cobra object
 
         :return: Success or failure of the function
         :rtype: bool
         """
+        #imported here to keep cheap the import of rpSBML
+        from cobra    import io as cobra_io
         try:
-            with NamedTemporaryFile() as temp_f:
-                self.writeSBML(temp_f.name)
-                #self.logger.info(glob(tmpOutputFolder+'/*'))
-                #self.logger.info(cobra.io.validate_sbml_model(glob(tmpOutputFolder+'/*')[0]))
-                cobraModel = cobra_io.read_sbml_model(temp_f.name, use_fbc_package=True)
+            #cobrapy reads the SBML from a string as from a file, without writing the model to disk
+            #self.logger.info(cobra.io.validate_sbml_model(libsbml.writeSBMLToString(self.getDocument())))
+            cobraModel = cobra_io.read_sbml_model(libsbml.writeSBMLToString(self.getDocument()), use_fbc_package=True)
             #self.cobraModel = cobra.io.read_sbml_model(self.rpsbml.document.toXMLNode().toXMLString(), use_fbc_package=True)
             #use CPLEX
             # self.cobraModel.solver = 'cplex'
@@ -1361,24 +1575,28 @@ class rpSBML:
         self.checklibSBML(obj, 'Getting objective '+str(objective_id))
         self.addUpdateBRSynth(obj, 'flux_value', str(cobra_results.objective_value), 'mmol_per_gDW_per_hr', False)
         self.logger.debug('Set the objective '+str(objective_id)+' a flux_value of '+str(cobra_results.objective_value))
+        #the fluxes are looked up once per reaction
+        fluxes = cobra_results.fluxes
         for flux_obj in obj.getListOfFluxObjectives():
+            flux_reaction = flux_obj.getReaction()
+            flux = fluxes.get(flux_reaction)
             #sometimes flux cannot be returned
-            if cobra_results.fluxes.get(flux_obj.getReaction())==None:
-                self.logger.warning('Cobra BUG: Cannot retreive '+str(flux_obj.getReaction())+' flux from cobrapy... setting to 0.0')
-                self.addUpdateBRSynth(flux_obj, 'flux_value', str(0.0), 'mmol_per_gDW_per_hr', False)
-                self.logger.debug('Set the reaction '+str(flux_obj.getReaction())+' a flux_value of '+str(0.0))
-            else:
-                self.addUpdateBRSynth(flux_obj, 'flux_value', str(cobra_results.fluxes.get(flux_obj.getReaction())), 'mmol_per_gDW_per_hr', False)
-                self.logger.debug('Set the reaction '+str(flux_obj.getReaction())+' a flux_value of '+str(cobra_results.fluxes.get(flux_obj.getReaction())))
+            if flux is None:
+                self.logger.warning('Cobra BUG: Cannot retreive '+str(flux_reaction)+' flux from cobrapy... setting to 0.0')
+                flux = 0.0
+            self.addUpdateBRSynth(flux_obj, 'flux_value', str(flux), 'mmol_per_gDW_per_hr', False)
+            self.logger.debug('Set the reaction '+str(flux_reaction)+' a flux_value of '+str(flux))
         #write all the results to the reactions of pathway_id
+        model = self.getModel()
         for member in rp_pathway.getListOfMembers():
-            reac = self.getModel().getReaction(member.getIdRef())
+            reac = model.getReaction(member.getIdRef())
             if reac==None:
                 self.logger.error('Cannot retreive the following reaction: '+str(member.getIdRef()))
                 #return False
                 continue
-            self.logger.debug('Set the reaction '+str(member.getIdRef())+' a '+str('fba_'+str(objective_id))+' of '+str(cobra_results.fluxes.get(reac.getId())))
-            self.addUpdateBRSynth(reac, 'fba_'+str(objective_id), str(cobra_results.fluxes.get(reac.getId())), 'mmol_per_gDW_per_hr', False)
+            flux = fluxes.get(reac.getId())
+            self.logger.debug('Set the reaction '+str(member.getIdRef())+' a '+str('fba_'+str(objective_id))+' of '+str(flux))
+            self.addUpdateBRSynth(reac, 'fba_'+str(objective_id), str(flux), 'mmol_per_gDW_per_hr', False)
 
 
     def _nameToSbmlId(self, name):
@@ -1393,19 +1611,9 @@ class rpSBML:
         :return: SBML valid string
         :rtype: str
         """
-        IdStream = []
-        count = 0
-        end = len(name)
-        if '0' <= name[count] and name[count] <= '9':
-            IdStream.append('_')
-        for count in range(0, end):
-            if (('0' <= name[count] and name[count] <= '9') or
-                    ('a' <= name[count] and name[count] <= 'z') or
-                    ('A' <= name[count] and name[count] <= 'Z')):
-                IdStream.append(name[count])
-            else:
-                IdStream.append('_')
-        Id = ''.join(IdStream)
+        Id = rpSBML._SBML_ID_INVALID.sub('_', name)
+        if '0' <= name[0] and name[0] <= '9':
+            Id = '_'+Id
         if Id[len(Id) - 1] != '_':
             return Id
         return Id[:-1]
@@ -1414,7 +1622,8 @@ class rpSBML:
     def _genMetaID(self, name):
         """String to hashed id
 
-        Hash an input string and then pass it to _nameToSbmlId()
+        Hash an input string and make it a valid SBML id as _nameToSbmlId() would, the hexadecimal digest
+        only needs a '_' prefix when it starts with a digit
 
         :param name: Input string
 
@@ -1423,7 +1632,10 @@ class rpSBML:
         :return: Hashed string id
         :rtype: str
         """
-        return self._nameToSbmlId(sha256(str(name).encode('utf-8')).hexdigest())
+        meta_id = sha256(str(name).encode('utf-8')).hexdigest()
+        if '0' <= meta_id[0] and meta_id[0] <= '9':
+            return '_'+meta_id
+        return meta_id
 
 
     def _compareXref(self, current, toadd):
@@ -1438,17 +1650,17 @@ class rpSBML:
         :return: Difference between the two cross-reference dictionaries
         :rtype: dict
         """
-        toadd = deepcopy(toadd)
-        for database_id in current:
-            try:
-                list_diff = [i for i in toadd[database_id] if i not in current[database_id]]
-                if not list_diff:
-                    toadd.pop(database_id)
-                else:
-                    toadd[database_id] = list_diff
-            except KeyError:
-                pass
-        return toadd
+        diff = {}
+        for database_id, ids in toadd.items():
+            current_ids = current.get(database_id)
+            if current_ids is None:
+                diff[database_id] = list(ids)
+            else:
+                current_ids = set(current_ids)
+                list_diff = [i for i in ids if i not in current_ids]
+                if list_diff:
+                    diff[database_id] = list_diff
+        return diff
 
 
     ######################################################################
@@ -1466,20 +1678,7 @@ class rpSBML:
         :return: The default annotation string
         :rtype: str
         """
-        return '''<annotation>
-  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/">
-    <rdf:Description rdf:about="#'''+str(meta_id or '')+'''">
-      <bqbiol:is>
-        <rdf:Bag>
-        </rdf:Bag>
-      </bqbiol:is>
-    </rdf:Description>
-    <rdf:BRSynth rdf:about="#'''+str(meta_id or '')+'''">
-      <brsynth:brsynth xmlns:brsynth="http://brsynth.eu">
-      </brsynth:brsynth>
-    </rdf:BRSynth>
-  </rdf:RDF>
-</annotation>'''
+        return rpSBML._ANNOT_BOTH.format(meta_id=str(meta_id or ''))
 
 
     def _defaultBRSynthAnnot(self, meta_id):
@@ -1492,14 +1691,7 @@ class rpSBML:
         :return: The default annotation string
         :rtype: str
         """
-        return '''<annotation>
-  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/">
-    <rdf:BRSynth rdf:about="#'''+str(meta_id or '')+'''">
-      <brsynth:brsynth xmlns:brsynth="http://brsynth.eu">
-      </brsynth:brsynth>
-    </rdf:BRSynth>
-  </rdf:RDF>
-</annotation>'''
+        return rpSBML._ANNOT_BRSYNTH.format(meta_id=str(meta_id or ''))
 
 
     def _defaultMIRIAMAnnot(self, meta_id):
@@ -1512,16 +1704,7 @@ class rpSBML:
         :return: The default annotation string
         :rtype: str
         """
-        return '''<annotation>
-  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/">
-    <rdf:Description rdf:about="#'''+str(meta_id or '')+'''">
-      <bqbiol:is>
-        <rdf:Bag>
-        </rdf:Bag>
-      </bqbiol:is>
-    </rdf:Description>
-  </rdf:RDF>
-</annotation>'''
+        return rpSBML._ANNOT_MIRIAM.format(meta_id=str(meta_id or ''))
 
 
 
@@ -1552,55 +1735,25 @@ class rpSBML:
         :return: Sucess or failure of the function
         """
         # self.logger.debug('############### '+str(annot_header)+' ################')
+        #### create the string, its parts are joined once
+        # the form of the entries is chosen once for all the values
+        if isAlone:
+            entry = rpSBML._BRSYNTH_ALONE.format
+        elif units:
+            entry = rpSBML._BRSYNTH_UNITS.format
+        else:
+            entry = rpSBML._BRSYNTH_VALUE.format
+        units = str(units)
         if isList:
-            annotation = '''<annotation>
-      <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/" xmlns:bqmodel="http://biomodels.net/model-qualifiers/">
-        <rdf:BRSynth rdf:about="# adding">
-          <brsynth:brsynth xmlns:brsynth="http://brsynth.eu">
-            <brsynth:'''+str(annot_header)+'''>'''
-            if isSort:
-                for name in sorted(value, key=value.get, reverse=True):
-                    if isAlone:
-                        annotation += '<brsynth:'+str(name)+'>'+str(value[name])+'</brsynth:'+str(name)+'>'
-                    else:
-                        if units:
-                            annotation += '<brsynth:'+str(name)+' units="'+str(units)+'" value="'+str(value[name])+'" />'
-                        else:
-                            annotation += '<brsynth:'+str(name)+' value="'+str(value[name])+'" />'
-            else:
-                for name in value:
-                    if isAlone:
-                        annotation += '<brsynth:'+str(name)+'>'+str(value[name])+'</brsynth:'+str(name)+'>'
-                    else:
-                        if units:
-                            annotation += '<brsynth:'+str(name)+' units="'+str(units)+'" value="'+str(value[name])+'" />'
-                        else:
-                            annotation += '<brsynth:'+str(name)+' value="'+str(value[name])+'" />'
-            annotation += '''
-            </brsynth:'''+str(annot_header)+'''>
-          </brsynth:brsynth>
-        </rdf:BRSynth>
-      </rdf:RDF>
-    </annotation>'''
+            parts = ['<brsynth:'+str(annot_header)+'>']
+            for name in (sorted(value, key=value.get, reverse=True) if isSort else value):
+                parts.append(entry(name=str(name), value=str(value[name]), units=units))
+            parts.append('</brsynth:'+str(annot_header)+'>')
+            annotation = ''.join(parts)
         else:
-            #### create the string
-            annotation = '''<annotation>
-      <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/" xmlns:bqmodel="http://biomodels.net/model-qualifiers/">
-        <rdf:BRSynth rdf:about="# adding">
-          <brsynth:brsynth xmlns:brsynth="http://brsynth.eu">'''
-            if isAlone:
-                annotation += '<brsynth:'+str(annot_header)+'>'+str(value)+'</brsynth:'+str(annot_header)+'>'
-            else:
-                if units:
-                    annotation += '<brsynth:'+str(annot_header)+' units="'+str(units)+'" value="'+str(value)+'" />'
-                else:
-                    annotation += '<brsynth:'+str(annot_header)+' value="'+str(value)+'" />'
-            annotation += '''
-          </brsynth:brsynth>
-        </rdf:BRSynth>
-      </rdf:RDF>
-    </annotation>'''
-        annot_obj = libsbml.XMLNode.convertStringToXMLNode(annotation)
+            annotation = entry(name=str(annot_header), value=str(value), units=units)
+        # only the entry is parsed, in the BRSynth namespace, instead of a whole annotation to walk down to it
+        annot_obj = libsbml.XMLNode.convertStringToXMLNode(annotation, rpSBML._BRSYNTH_NS)
         if not annot_obj:
             self.logger.error('Cannot conver this string to annotation object: '+str(annotation))
             return False
@@ -1613,55 +1766,20 @@ class rpSBML:
             if not obj_annot:
                 self.logger.error('Cannot update BRSynth annotation')
                 return False
-        brsynth_annot = obj_annot.getChild('RDF').getChild('BRSynth').getChild('brsynth')
+        brsynth_annot = rpSBML._walkAnnotation(obj_annot, rpSBML._BRSYNTH_PATH)
         if not brsynth_annot:
              self.logger.error('Cannot find the BRSynth annotation')
              return False
-        # add the annotation and replace if it exists
-        isfound_target = False
-        # # self.logger.debug(brsynth_annot.toXMLString())
-        for i in range(brsynth_annot.getNumChildren()):
-            # self.logger.debug(annot_header+' -- '+str(brsynth_annot.getChild(i).getName()))
-            if annot_header == brsynth_annot.getChild(i).getName():
-                isfound_target = True
-                '''
-                self.checklibSBML(brsynth_annot.removeChild(brsynth_annot.getIndex(i)),
-                    'Removing annotation '+str(annot_header))
-                '''
-                self.checklibSBML(brsynth_annot.removeChild(i), 'Removing annotation '+str(annot_header))
-                isfound_source = False
-                source_brsynth_annot = annot_obj.getChild('RDF').getChild('BRSynth').getChild('brsynth')
-                for y in range(source_brsynth_annot.getNumChildren()):
-                    # self.logger.debug('\t'+annot_header+' -- '+str(source_brsynth_annot.getChild(y).getName()))
-                    if str(annot_header)==str(source_brsynth_annot.getChild(y).getName()):
-                        isfound_source = True
-                        # self.logger.debug('Adding annotation to the brsynth annotation: '+str(source_brsynth_annot.getChild(y).toXMLString()))
-                        towrite_annot = source_brsynth_annot.getChild(y)
-                        # self.logger.debug(brsynth_annot.toXMLString())
-                        self.checklibSBML(brsynth_annot.addChild(towrite_annot), ' 1 - Adding annotation to the brsynth annotation')
-                        # self.logger.debug(brsynth_annot.toXMLString())
-                        break
-                if not isfound_source:
-                    self.logger.error('Cannot find '+str(annot_header)+' in source annotation')
-        if not isfound_target:
+        # add the annotation and replace if it exists, the entries are looked up by name by libSBML
+        # (first child with that name, -1 if there is none) rather than by comparing the name of every child
+        target_index = brsynth_annot.getIndex(str(annot_header))
+        # self.logger.debug('Adding annotation to the brsynth annotation: '+str(annot_obj.toXMLString()))
+        if not target_index==-1:
+            self.checklibSBML(brsynth_annot.removeChild(target_index), 'Removing annotation '+str(annot_header))
+            self.checklibSBML(brsynth_annot.addChild(annot_obj), ' 1 - Adding annotation to the brsynth annotation')
+        else:
             # self.logger.debug('Cannot find '+str(annot_header)+' in target annotation')
-            isfound_source = False
-            source_brsynth_annot = annot_obj.getChild('RDF').getChild('BRSynth').getChild('brsynth')
-            for y in range(source_brsynth_annot.getNumChildren()):
-                # self.logger.debug('\t'+annot_header+' -- '+str(source_brsynth_annot.getChild(y).getName()))
-                if str(annot_header)==str(source_brsynth_annot.getChild(y).getName()):
-                    isfound_source = True
-                    # self.logger.debug('Adding annotation to the brsynth annotation: '+str(source_brsynth_annot.getChild(y).toXMLString()))
-                    towrite_annot = source_brsynth_annot.getChild(y)
-                    # self.logger.debug(brsynth_annot.toXMLString())
-                    self.checklibSBML(brsynth_annot.addChild(towrite_annot), '2 - Adding annotation to the brsynth annotation')
-                    # self.logger.debug(brsynth_annot.toXMLString())
-                    break
-            if not isfound_source:
-                self.logger.error('Cannot find '+str(annot_header)+' in source annotation')
-            # toWrite_annot = annot_obj.getChild('RDF').getChild('BRSynth').getChild('brsynth').getChild(annot_header)
-            # self.checklibSBML(brsynth_annot.addChild(toWrite_annot), 'Adding annotation to the brsynth annotation')
-                return False
+            self.checklibSBML(brsynth_annot.addChild(annot_obj), '2 - Adding annotation to the brsynth annotation')
         '''
         if brsynth_annot.getChild(annot_header).toXMLString()=='':
             toWrite_annot = annot_obj.getChild('RDF').getChild('BRSynth').getChild('brsynth').getChild(annot_header)
@@ -1716,8 +1834,9 @@ class rpSBML:
         miriam_annot = None
         isReplace = False
         try:
-            miriam_annot = sbase_obj.getAnnotation().getChild('RDF').getChild('Description').getChild('is').getChild('Bag')
-            miriam_elements = self.readMIRIAMAnnotation(sbase_obj.getAnnotation())
+            obj_annot = sbase_obj.getAnnotation()
+            miriam_annot = obj_annot.getChild('RDF').getChild('Description').getChild('is').getChild('Bag')
+            miriam_elements = self.readMIRIAMAnnotation(obj_annot)
             if not miriam_elements:
                 isReplace = True
                 if not meta_id:
@@ -1739,6 +1858,7 @@ class rpSBML:
                 return False
         # compile the list of current species
         inside = {}
+        header_miriam = self.header_miriam[type_param]
         for i in range(miriam_annot.getNumChildren()):
             single_miriam = miriam_annot.getChild(i)
             if single_miriam.getAttributes().getLength()>1:
@@ -1746,60 +1866,41 @@ class rpSBML:
                 continue
             single_miriam_attr = single_miriam.getAttributes()
             if not single_miriam_attr.isEmpty():
-                try:
-                    db = single_miriam_attr.getValue(0).split('/')[-2]
-                    v = single_miriam_attr.getValue(0).split('/')[-1]
-                    inside[self.header_miriam[type_param][db]].append(v)
-                except KeyError:
-                    try:
-                        db = single_miriam_attr.getValue(0).split('/')[-2]
-                        v = single_miriam_attr.getValue(0).split('/')[-1]
-                        inside[self.header_miriam[type_param][db]] = [v]
-                    except KeyError:
-                        self.logger.warning('Cannot find the self.header_miriram entry '+str(db))
-                        continue
+                uri = single_miriam_attr.getValue(0).split('/')
+                db = uri[-2]
+                v = uri[-1]
+                database_id = header_miriam.get(db)
+                if database_id is None:
+                    self.logger.warning('Cannot find the self.header_miriram entry '+str(db))
+                    continue
+                if database_id in inside:
+                    inside[database_id].append(v)
+                else:
+                    inside[database_id] = [v]
             else:
                 self.logger.warning('Cannot return MIRIAM attribute')
                 pass
         # add or ignore
         toadd = self._compareXref(inside, xref)
+        miriam_header = self.miriam_header[type_param]
+        # the kegg species ids are either compounds or drugs according to their first character
+        kegg_prefix = {'C': miriam_header.get('kegg_c'), 'D': miriam_header.get('kegg_d')}
         for database_id in toadd:
+            # not sure how to avoid having it that way
+            if database_id not in miriam_header:
+                continue
             for species_id in toadd[database_id]:
-                # not sure how to avoid having it that way
-                if database_id in self.miriam_header[type_param]:
-                    try:
-                        # determine if the dictionnaries
-                        annotation = '''<annotation>
-    <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:bqbiol="http://biomodels.net/biology-qualifiers/" xmlns:bqmodel="http://biomodels.net/model-qualifiers/">
-    <rdf:Description rdf:about="# tmp">
-      <bqbiol:is>
-        <rdf:Bag>'''
-                        if type_param=='species':
-                            if database_id=='kegg' and species_id[0]=='C':
-                                annotation += '''
-              <rdf:li rdf:resource="http://identifiers.org/'''+self.miriam_header[type_param]['kegg_c']+str(species_id)+'''"/>'''
-                            elif database_id=='kegg' and species_id[0]=='D':
-                                annotation += '''
-              <rdf:li rdf:resource="http://identifiers.org/'''+self.miriam_header[type_param]['kegg_d']+str(species_id)+'''"/>'''
-                            else:
-                                annotation += '''
-              <rdf:li rdf:resource="http://identifiers.org/'''+self.miriam_header[type_param][database_id]+str(species_id)+'''"/>'''
-                        else:
-                            annotation += '''
-              <rdf:li rdf:resource="http://identifiers.org/'''+self.miriam_header[type_param][database_id]+str(species_id)+'''"/>'''
-                        annotation += '''
-        </rdf:Bag>
-      </bqbiol:is>
-    </rdf:Description>
-    </rdf:RDF>
-    </annotation>'''
-                        toPass_annot = libsbml.XMLNode.convertStringToXMLNode(annotation)
-                        toWrite_annot = toPass_annot.getChild('RDF').getChild('Description').getChild('is').getChild('Bag').getChild(0)
-                        miriam_annot.insertChild(0, toWrite_annot)
-                    except KeyError:
-                        # WARNING need to check this
-                        self.logger.warning('Cannot find '+str(database_id)+' in self.miriam_header for '+str(type_param))
-                        continue
+                # determine if the dictionnaries
+                prefix = miriam_header[database_id]
+                if type_param=='species' and database_id=='kegg' and species_id[0] in kegg_prefix:
+                    prefix = kegg_prefix[species_id[0]]
+                if prefix is None:
+                    # WARNING need to check this
+                    self.logger.warning('Cannot find '+str(database_id)+' in self.miriam_header for '+str(type_param))
+                    continue
+                # only the entry is parsed, in the RDF namespace
+                toWrite_annot = libsbml.XMLNode.convertStringToXMLNode(rpSBML._MIRIAM_ENTRY.format(uri=prefix+str(species_id)), rpSBML._RDF_NS)
+                miriam_annot.insertChild(0, toWrite_annot)
         if isReplace:
             ori_miriam_annot = sbase_obj.getAnnotation()
             if not ori_miriam_annot:
@@ -1822,25 +1923,30 @@ class rpSBML:
         :rtype: dict
         :return: Dictionnary of the pathway annotation
         """
-        groups = self.getModel().getPlugin('groups')
+        model = self.getModel()
+        groups = model.getPlugin('groups')
         rp_pathway = groups.getGroup(pathway_id)
         reactions = rp_pathway.getListOfMembers()
         # pathway
         rpsbml_json = {}
         rpsbml_json['pathway'] = {}
         rpsbml_json['pathway']['brsynth'] = self.readBRSYNTHAnnotation(rp_pathway.getAnnotation(), self.logger)
-        # reactions
+        # reactions, their species are collected on the way in the order of readUniqueRPspecies
         rpsbml_json['reactions'] = {}
+        species_ids = {}
         for member in reactions:
-            reaction = self.getModel().getReaction(member.getIdRef())
+            reaction_id = member.getIdRef()
+            reaction = model.getReaction(reaction_id)
             annot = reaction.getAnnotation()
-            rpsbml_json['reactions'][member.getIdRef()] = {}
-            rpsbml_json['reactions'][member.getIdRef()]['brsynth'] = self.readBRSYNTHAnnotation(annot, self.logger)
-            rpsbml_json['reactions'][member.getIdRef()]['miriam'] = self.readMIRIAMAnnotation(annot)
+            rpsbml_json['reactions'][reaction_id] = {}
+            rpsbml_json['reactions'][reaction_id]['brsynth'] = self.readBRSYNTHAnnotation(annot, self.logger)
+            rpsbml_json['reactions'][reaction_id]['miriam'] = self.readMIRIAMAnnotation(annot)
+            species_ids.update(dict.fromkeys(pro.getSpecies() for pro in reaction.getListOfProducts()))
+            species_ids.update(dict.fromkeys(rea.getSpecies() for rea in reaction.getListOfReactants()))
         # loop though all the species
         rpsbml_json['species'] = {}
-        for spe_id in self.readUniqueRPspecies(pathway_id):
-            species = self.getModel().getSpecies(spe_id)
+        for spe_id in species_ids:
+            species = model.getSpecies(spe_id)
             annot = species.getAnnotation()
             rpsbml_json['species'][spe_id] = {}
             rpsbml_json['species'][spe_id]['brsynth'] = self.readBRSYNTHAnnotation(annot, self.logger)
@@ -1869,13 +1975,14 @@ class rpSBML:
         if not os_path.isfile(inFile):
             self.logger.error('Invalid input file')
             raise FileNotFoundError
-        self.document = libsbml.readSBMLFromFile(inFile)
-        rpSBML.checklibSBML(self.getDocument(), 'reading input file')
-        errors = self.getDocument().getNumErrors()
+        self.document = rpSBML._READER.readSBMLFromFile(inFile)
+        document = self.getDocument()
+        rpSBML.checklibSBML(document, 'reading input file')
         # display the errors in the log accordning to the severity
-        for err in [self.getDocument().getError(i) for i in range(self.getDocument().getNumErrors())]:
+        for i in range(document.getNumErrors()):
+            err = document.getError(i)
             # TODO if the error is related to packages not enabled (like groups or fbc) activate them
-            if err.isFatal:
+            if err.isFatal():
                 self.logger.error('libSBML reading error: '+str(err.getShortMessage()))
                 raise FileNotFoundError
             else:
@@ -1961,11 +2068,13 @@ class rpSBML:
         if not objective_id:
             objective_id = 'obj_'+'_'.join(reactions)
             self.logger.info('Setting objective as '+str(objective_id))
+        # an objective matches if all of its reactions are in reactions, the first one that is not stops the comparison
+        reactions_set = set(reactions)
         for objective in fbc_plugin.getListOfObjectives():
             if objective.getId()==objective_id:
                 self.logger.warning('The specified objective id ('+str(objective_id)+') already exists')
                 return objective_id
-            if not set([i.getReaction() for i in objective.getListOfFluxObjectives()])-set(reactions):
+            if all(i.getReaction() in reactions_set for i in objective.getListOfFluxObjectives()):
                 # TODO: consider setting changing the name of the objective
                 self.logger.warning('The specified objective id ('+str(objective_id)+') has another objective with the same reactions: '+str(objective.getId()))
                 return objective.getId()
@@ -2015,11 +2124,13 @@ class rpSBML:
         :return: Dictionnary of reaction rules (rule_id as key)
         """
         toRet = {}
+        model = self.getModel()
         for reacId in self.readRPpathwayIDs(pathway_id):
-            reac = self.getModel().getReaction(reacId)
-            brsynth_annot = self.readBRSYNTHAnnotation(reac.getAnnotation(), self.logger)
-            if not brsynth_annot['rule_id']=='' and not brsynth_annot['smiles']=='':
-                toRet[brsynth_annot['rule_id']] = brsynth_annot['smiles'].replace('&gt;', '>')
+            reac = model.getReaction(reacId)
+            # only the two entries that are needed are read
+            brsynth_annot = rpSBML._readBRSYNTHText(reac.getAnnotation(), ('rule_id', 'smiles'))
+            if brsynth_annot.get('rule_id') and brsynth_annot.get('smiles'):
+                toRet[brsynth_annot['rule_id']] = brsynth_annot['smiles']
         return toRet
 
 
@@ -2036,15 +2147,14 @@ class rpSBML:
         :return: Dictionary of the pathway species and reactions
         """
         reacMembers = {}
+        model = self.getModel()
         for reacId in self.readRPpathwayIDs(pathway_id):
-            reacMembers[reacId] = {}
-            reacMembers[reacId]['products'] = {}
-            reacMembers[reacId]['reactants'] = {}
-            reac = self.getModel().getReaction(reacId)
-            for pro in reac.getListOfProducts():
-                reacMembers[reacId]['products'][pro.getSpecies()] = pro.getStoichiometry()
-            for rea in reac.getListOfReactants():
-                reacMembers[reacId]['reactants'][rea.getSpecies()] = rea.getStoichiometry()
+            reac = model.getReaction(reacId)
+            # the species references are accessed by index, cheaper than iterating over the libSBML lists
+            products = [reac.getProduct(i) for i in range(reac.getNumProducts())]
+            reactants = [reac.getReactant(i) for i in range(reac.getNumReactants())]
+            reacMembers[reacId] = {'products': {pro.getSpecies(): pro.getStoichiometry() for pro in products},
+                                   'reactants': {rea.getSpecies(): rea.getStoichiometry() for rea in reactants}}
         return reacMembers
 
 
@@ -2058,18 +2168,36 @@ class rpSBML:
         :rtype: list
         :return: List of unique species
         """
-        rpSpecies = self.readRPspecies()
-        toRet = []
+        rpSpecies = self.readRPspecies(pathway_id)
+        # the keys of a dict keep the first time each species is seen
+        toRet = {}
         for i in rpSpecies:
             for y in rpSpecies[i]:
-                for z in rpSpecies[i][y]:
-                    if z not in toRet:
-                        toRet.append(z)
-        return toRet
+                toRet.update(dict.fromkeys(rpSpecies[i][y]))
+        return list(toRet)
         # reacMembers = self.readRPspecies(pathway_id)
         # return set(set(ori_rp_path['products'].keys())|set(ori_rp_path['reactants'].keys()))
 
 
+    @staticmethod
+    def _splitIdentifiersURI(uri):
+        """Return the database and the id of an identifiers.org uri of a MIRIAM annotation
+
+        :param uri: The uri, ex: http://identifiers.org/chebi/CHEBI:15377
+
+        :type uri: str
+
+        :rtype: tuple
+        :return: The database, without its sub-namespace, and the id without its prefix, ex: ('chebi', '15377')
+        """
+        uri_split = uri.split('/')
+        cid = uri_split[-1]
+        cid_split = cid.split(':')
+        if len(cid_split)==2:
+            cid = cid_split[1]
+        return uri_split[-2].split('.')[0], cid
+
+
     def readTaxonAnnotation(self, annot):
         """Return he taxonomy ID from an annotation
 
@@ -2088,11 +2216,7 @@ class rpSBML:
                 if str_annot=='':
                     self.logger.warning('This contains no attributes: '+str(bag.getChild(i).toXMLString()))
                     continue
-                dbid = str_annot.split('/')[-2].split('.')[0]
-                if len(str_annot.split('/')[-1].split(':'))==2:
-                    cid = str_annot.split('/')[-1].split(':')[1]
-                else:
-                    cid = str_annot.split('/')[-1]
+                dbid, cid = rpSBML._splitIdentifiersURI(str_annot)
                 if dbid not in toRet:
                     toRet[dbid] = []
                 toRet[dbid].append(cid)
@@ -2119,11 +2243,7 @@ class rpSBML:
                 if str_annot=='':
                     self.logger.warning('This contains no attributes: '+str(bag.getChild(i).toXMLString()))
                     continue
-                dbid = str_annot.split('/')[-2].split('.')[0]
-                if len(str_annot.split('/')[-1].split(':'))==2:
-                    cid = str_annot.split('/')[-1].split(':')[1]
-                else:
-                    cid = str_annot.split('/')[-1]
+                dbid, cid = rpSBML._splitIdentifiersURI(str_annot)
                 if dbid not in toRet:
                     toRet[dbid] = []
                 toRet[dbid].append(cid)
@@ -2143,7 +2263,7 @@ class rpSBML:
         :rtype: dict
         :return: Dictionary of all the BRSynth annotations
         """
-        logger = logger or logging.getLogger(__name__)
+        logger = logger or _LOG
         toRet = {'dfG_prime_m':   {},
                  'dfG_uncert':    {},
                  'dfG_prime_o':   {},
@@ -2162,7 +2282,7 @@ class rpSBML:
         if not annot:
             logger.warning('The passed annotation is None')
             return {}
-        bag = annot.getChild('RDF').getChild('BRSynth').getChild('brsynth')
+        bag = rpSBML._walkAnnotation(annot, rpSBML._BRSYNTH_PATH)
         for i in range(bag.getNumChildren()):
             ann = bag.getChild(i)
             if ann=='':
@@ -2210,6 +2330,32 @@ class rpSBML:
         # return toRet
 
 
+    @staticmethod
+    def _readBRSYNTHText(annot, names):
+        """Return some of the text entries of a BRSynth annotation, read as readBRSYNTHAnnotation does but without the others
+
+        :param annot: The annotation object of libSBML
+        :param names: The names of the text entries to read (ex: rule_id, smiles)
+
+        :type annot: libsbml.XMLNode
+        :type names: tuple
+
+        :rtype: dict
+        :return: Dictionary of the non-empty entries
+        """
+        toRet = {}
+        if not annot:
+            return toRet
+        bag = rpSBML._walkAnnotation(annot, rpSBML._BRSYNTH_PATH)
+        for i in range(bag.getNumChildren()):
+            ann = bag.getChild(i)
+            if ann.getName() in names:
+                toRet[ann.getName()] = ann.getChild(0).toXMLString()
+        if 'smiles' in toRet:
+            toRet['smiles'] = toRet['smiles'].replace('&gt;', '>')
+        return {k: v for k, v in toRet.items() if v}
+
+
     # TODO: delete
     def readReactionSpecies_old(self, reaction, isID=False):
         """Return the products and the species associated with a reaction
@@ -2226,10 +2372,11 @@ class rpSBML:
         # TODO: check that reaction is either an sbml species; if not check that its a string and that
         # it exists in the rpsbml model
         toRet = {'left': {}, 'right': {}}
+        model = self.getModel()
         # reactants
         for i in range(reaction.getNumReactants()):
             reactant_ref = reaction.getReactant(i)
-            reactant = self.getModel().getSpecies(reactant_ref.getSpecies())
+            reactant = model.getSpecies(reactant_ref.getSpecies())
             if isID:
                 toRet['left'][reactant.getId()] = int(reactant_ref.getStoichiometry())
             else:
@@ -2237,7 +2384,7 @@ class rpSBML:
         # products
         for i in range(reaction.getNumProducts()):
             product_ref = reaction.getProduct(i)
-            product = self.getModel().getSpecies(product_ref.getSpecies())
+            product = model.getSpecies(product_ref.getSpecies())
             if isID:
                 toRet['right'][product.getId()] = int(product_ref.getStoichiometry())
             else:
@@ -2285,7 +2432,9 @@ class rpSBML:
         :rtype: bool
         :return: True if exists and False if not
         """
-        if speciesName in [i.getName() for i in self.getModel().getListOfSpecies()] or speciesName+'__64__'+compartment_id in [i.getId() for i in self.getModel().getListOfSpecies()]:
+        model = self.getModel()
+        # the ids are unique and looked up by libSBML
+        if any(i.getName()==speciesName for i in model.getListOfSpecies()) or model.getSpecies(speciesName+'__64__'+compartment_id) is not None:
             return True
         return False
 
@@ -2351,9 +2500,10 @@ class rpSBML:
         :return: Dictionary of the pathway
         """
         pathway = {}
+        model = self.getModel()
         for member in self.readRPpathwayIDs(pathway_id):
             # TODO: need to find a better way
-            reaction = self.getModel().getReaction(member)
+            reaction = model.getReaction(member)
             brsynthAnnot = rpSBML.readBRSYNTHAnnotation(reaction.getAnnotation(), self.logger)
             speciesReac = self.readReactionSpecies(reaction)
             step = {'reaction_id': member,
@@ -2391,18 +2541,27 @@ class rpSBML:
         """
         source_dict = self.readBRSYNTHAnnotation(source_annot, self.logger)
         target_dict = self.readBRSYNTHAnnotation(target_annot, self.logger)
-        # ignore thse when comparing reactions
-        for i in ['path_id', 'step', 'sub_step', 'rule_score', 'rule_ori_reac']:
-            try:
-                del source_dict[i]
-            except KeyError:
-                pass
-            try:
-                del target_dict[i]
-            except KeyError:
-                pass
+        return self.compareBRSYNTHAnnotations_dict_dict(source_dict, target_dict)
+
+
+    @staticmethod
+    def compareBRSYNTHAnnotations_dict_dict(source_dict, target_dict):
+        """Compare two BRSynth annotations as dictionaries, as returned by readBRSYNTHAnnotation
+
+        :param source_dict: Source dictionary
+        :param target_dict: Target dictionary
+
+        :type source_dict: dict
+        :type target_dict: dict
+
+        :rtype: bool
+        :return: True if there is at least one similar and False if none
+        """
         # list the common keys between the two
-        for same_key in list(set(list(source_dict.keys())).intersection(list(target_dict.keys()))):
+        for same_key in set(source_dict).intersection(target_dict):
+            # ignore thse when comparing reactions
+            if same_key in ('path_id', 'step', 'sub_step', 'rule_score', 'rule_ori_reac'):
+                continue
             if source_dict[same_key] and target_dict[same_key]:
                 if source_dict[same_key]==target_dict[same_key]:
                     return True
@@ -2425,13 +2584,22 @@ class rpSBML:
         """
         source_dict = self.readMIRIAMAnnotation(source_annot)
         target_dict = self.readMIRIAMAnnotation(target_annot)
-        # list the common keys between the two
-        for com_key in set(list(source_dict.keys()))-(set(list(source_dict.keys()))-set(list(target_dict.keys()))):
-            # compare the keys and if same is non-empty means that there
-            # are at least one instance of the key that is the same
-            if bool(set(source_dict[com_key]) & set(target_dict[com_key])):
-                return True
-        return False
+        return self.compareAnnotations_dict_dict(source_dict, target_dict)
+
+
+    def readMIRIAMKeys(self, annot):
+        """Return the set of the (database, id) pairs of a MIRIAM annotation
+
+        Two annotations match with compareMIRIAMAnnotations if, and only if, their sets intersect
+
+        :param annot: The annotation object of libSBML
+
+        :type annot: libsbml.XMLNode
+
+        :rtype: set
+        :return: Set of (database, id) tuples
+        """
+        return {(dbid, cid) for dbid, cids in self.readMIRIAMAnnotation(annot).items() for cid in cids}
 
 
     def compareAnnotations_annot_dict(self, source_annot, target_dict):
@@ -2447,13 +2615,7 @@ class rpSBML:
         :return: True if there is at least one similar and False if none
         """
         source_dict = self.readMIRIAMAnnotation(source_annot)
-        # list the common keys between the two
-        for com_key in set(list(source_dict.keys()))-(set(list(source_dict.keys()))-set(list(target_dict.keys()))):
-            # compare the keys and if same is non-empty means that there
-            # are at least one instance of the key that is the same
-            if bool(set(source_dict[com_key]) & set(target_dict[com_key])):
-                return True
-        return False
+        return self.compareAnnotations_dict_dict(source_dict, target_dict)
 
 
     def compareAnnotations_dict_dict(self, source_dict, target_dict):
@@ -2469,14 +2631,34 @@ class rpSBML:
         :return: True if there is at least one similar and False if none
         """
         # list the common keys between the two
-        for com_key in set(list(source_dict.keys()))-(set(list(source_dict.keys()))-set(list(target_dict.keys()))):
-            # compare the keys and if same is non-empty means that there
+        for com_key in source_dict.keys() & target_dict.keys():
+            # compare the keys and if they are not disjoint means that there
             # are at least one instance of the key that is the same
-            if bool(set(source_dict[com_key]) & set(target_dict[com_key])):
+            if not set(source_dict[com_key]).isdisjoint(target_dict[com_key]):
                 return True
         return False
 
 
+    def _speciesAnnotations(self, model, species_id, cache):
+        """Return the MIRIAM and BRSynth annotations of a species, parsed only the first time it is requested with a given cache
+
+        :param model: The model of the species
+        :param species_id: The species id
+        :param cache: The annotations already parsed, by species id, is updated
+
+        :type model: libsbml.Model
+        :type species_id: str
+        :type cache: dict
+
+        :rtype: tuple
+        :return: The MIRIAM and BRSynth annotations dictionaries
+        """
+        if species_id not in cache:
+            annot = model.getSpecies(species_id).getAnnotation()
+            cache[species_id] = (self.readMIRIAMAnnotation(annot), self.readBRSYNTHAnnotation(annot, self.logger))
+        return cache[species_id]
+
+
     def compareRPpathways(self, measured_sbml):
         """Function to compare two SBML's RP pathways
 
@@ -2494,24 +2676,30 @@ class rpSBML:
         """
         # return all the species annotations of the RP pathways
         try:
+            meas_model = measured_sbml.getModel()
+            rp_model = self.getModel()
+            # the annotations are parsed once, the reactions with their MIRIAM annotation and the species with
+            # a (MIRIAM, BRSynth) tuple of their annotations, shared by all the steps they are part of
+            meas_species_annot = {}
+            rp_species_annot = {}
             meas_rp_species = measured_sbml.readRPspecies()
             found_meas_rp_species = measured_sbml.readRPspecies()
             for meas_step_id in meas_rp_species:
-                meas_rp_species[meas_step_id]['annotation'] = measured_sbml.getModel().getReaction(meas_step_id).getAnnotation()
+                meas_rp_species[meas_step_id]['annotation'] = self.readMIRIAMAnnotation(meas_model.getReaction(meas_step_id).getAnnotation())
                 found_meas_rp_species[meas_step_id]['found'] = False
                 for spe_name in meas_rp_species[meas_step_id]['reactants']:
-                    meas_rp_species[meas_step_id]['reactants'][spe_name] = measured_sbml.getModel().getSpecies(spe_name).getAnnotation()
+                    meas_rp_species[meas_step_id]['reactants'][spe_name] = self._speciesAnnotations(meas_model, spe_name, meas_species_annot)
                     found_meas_rp_species[meas_step_id]['reactants'][spe_name] = False
                 for spe_name in meas_rp_species[meas_step_id]['products']:
-                    meas_rp_species[meas_step_id]['products'][spe_name] = measured_sbml.getModel().getSpecies(spe_name).getAnnotation()
+                    meas_rp_species[meas_step_id]['products'][spe_name] = self._speciesAnnotations(meas_model, spe_name, meas_species_annot)
                     found_meas_rp_species[meas_step_id]['products'][spe_name] = False
             rp_rp_species = self.readRPspecies()
             for rp_step_id in rp_rp_species:
-                rp_rp_species[rp_step_id]['annotation'] = self.getModel().getReaction(rp_step_id).getAnnotation()
+                rp_rp_species[rp_step_id]['annotation'] = self.readMIRIAMAnnotation(rp_model.getReaction(rp_step_id).getAnnotation())
                 for spe_name in rp_rp_species[rp_step_id]['reactants']:
-                    rp_rp_species[rp_step_id]['reactants'][spe_name] = self.getModel().getSpecies(spe_name).getAnnotation()
+                    rp_rp_species[rp_step_id]['reactants'][spe_name] = self._speciesAnnotations(rp_model, spe_name, rp_species_annot)
                 for spe_name in rp_rp_species[rp_step_id]['products']:
-                    rp_rp_species[rp_step_id]['products'][spe_name] = self.getModel().getSpecies(spe_name).getAnnotation()
+                    rp_rp_species[rp_step_id]['products'][spe_name] = self._speciesAnnotations(rp_model, spe_name, rp_species_annot)
         except AttributeError:
             self.logger.error('TODO: debug, for some reason some are passed as None here')
             return False, {}
@@ -2522,7 +2710,7 @@ class rpSBML:
         ############## compare using the reactions ###################
         for meas_step_id in measured_sbml.readRPpathwayIDs():
             for rp_step_id in rp_rp_species:
-                if self.compareMIRIAMAnnotations(rp_rp_species[rp_step_id]['annotation'], meas_rp_species[meas_step_id]['annotation']):
+                if self.compareAnnotations_dict_dict(rp_rp_species[rp_step_id]['annotation'], meas_rp_species[meas_step_id]['annotation']):
                     found_meas_rp_species[meas_step_id]['found'] = True
                     found_meas_rp_species[meas_step_id]['rp_step_id'] = rp_step_id
                     break
@@ -2535,21 +2723,21 @@ class rpSBML:
                 ########## reactants ##########
                 for meas_spe_id in meas_rp_species[meas_step_id]['reactants']:
                     for rp_spe_id in rp_rp_species[rp_step_id]['reactants']:
-                        if self.compareMIRIAMAnnotations(meas_rp_species[meas_step_id]['reactants'][meas_spe_id], rp_rp_species[rp_step_id]['reactants'][rp_spe_id]):
+                        if self.compareAnnotations_dict_dict(meas_rp_species[meas_step_id]['reactants'][meas_spe_id][0], rp_rp_species[rp_step_id]['reactants'][rp_spe_id][0]):
                             found_meas_rp_species[meas_step_id]['reactants'][meas_spe_id] = True
                             break
                         else:
-                            if self.compareBRSYNTHAnnotations(meas_rp_species[meas_step_id]['reactants'][meas_spe_id], rp_rp_species[rp_step_id]['reactants'][rp_spe_id]):
+                            if self.compareBRSYNTHAnnotations_dict_dict(meas_rp_species[meas_step_id]['reactants'][meas_spe_id][1], rp_rp_species[rp_step_id]['reactants'][rp_spe_id][1]):
                                 found_meas_rp_species[meas_step_id]['reactants'][meas_spe_id] = True
                                 break
                 ########### products ###########
                 for meas_spe_id in meas_rp_species[meas_step_id]['products']:
                     for rp_spe_id in rp_rp_species[rp_step_id]['products']:
-                        if self.compareMIRIAMAnnotations(meas_rp_species[meas_step_id]['products'][meas_spe_id], rp_rp_species[rp_step_id]['products'][rp_spe_id]):
+                        if self.compareAnnotations_dict_dict(meas_rp_species[meas_step_id]['products'][meas_spe_id][0], rp_rp_species[rp_step_id]['products'][rp_spe_id][0]):
                             found_meas_rp_species[meas_step_id]['products'][meas_spe_id] = True
                             break
                         else:
-                            if self.compareBRSYNTHAnnotations(meas_rp_species[meas_step_id]['products'][meas_spe_id], rp_rp_species[rp_step_id]['products'][rp_spe_id]):
+                            if self.compareBRSYNTHAnnotations_dict_dict(meas_rp_species[meas_step_id]['products'][meas_spe_id][1], rp_rp_species[rp_step_id]['products'][rp_spe_id][1]):
                                 found_meas_rp_species[meas_step_id]['products'][meas_spe_id] = True
                                 break
                 ######### test to see the difference
@@ -2562,8 +2750,8 @@ class rpSBML:
                         break
         ################# Now see if all steps have been found ############
         if all(found_meas_rp_species[i]['found'] for i in found_meas_rp_species):
-            found_meas_rp_species['measured_model_id'] = measured_sbml.getModel().getId()
-            found_meas_rp_species['rp_model_id'] = self.getModel().getId()
+            found_meas_rp_species['measured_model_id'] = meas_model.getId()
+            found_meas_rp_species['rp_model_id'] = rp_model.getId()
             return True, found_meas_rp_species
         else:
             return False, {}
@@ -2642,9 +2830,10 @@ class rpSBML:
         # only for rp species
         groups = self.getModel().getPlugin('groups')
         rp_pathway = groups.getGroup(pathway_id)
-        reaction_id = sorted([(int(''.join(x for x in i.id_ref if x.isdigit())), i.id_ref) for i in rp_pathway.getListOfMembers()], key=lambda tup: tup[0], reverse=True)[0][1]
+        reaction_id = max(((int(''.join(x for x in i.id_ref if x.isdigit())), i.id_ref) for i in rp_pathway.getListOfMembers()), key=itemgetter(0))[1]
         # for reaction_id in [i.getId() for i in self.getModel().getListOfReactions()]:
-        for species_id in set([i.getSpecies() for i in self.getModel().getReaction(reaction_id).getListOfReactants()]+[i.getSpecies() for i in self.getModel().getReaction(reaction_id).getListOfProducts()]):
+        reaction = self.getModel().getReaction(reaction_id)
+        for species_id in set([i.getSpecies() for i in reaction.getListOfReactants()]+[i.getSpecies() for i in reaction.getListOfProducts()]):
             if not rpsbml:
                 isSpePro = self.isSpeciesProduct(species_id, [reaction_id])
             else:
@@ -14,9 +14,9 @@ class Test_rpGraph(TestCase):
 
     def setUp(self):
         # load a rpSBML file
-        rpsbml  = rpSBML(os_path.join(os_path.dirname(__file__),
-                                      'data', 'rpsbml.xml')     )
-        self.rpgraph = rpGraph(rpsbml)
+        self.rpsbml = rpSBML(os_path.join(os_path.dirname(__file__),
+                                          'data', 'rpsbml.xml')     )
+        self.rpgraph = rpGraph(self.rpsbml)
 
     def test_onlyConsumedSpecies(self):
         self.assertCountEqual(self.rpgraph.onlyConsumedSpecies(True, True),
@@ -38,3 +38,18 @@ class Test_rpGraph(TestCase):
                               'MNXM13__64__MNXC3'])
         self.assertCountEqual(self.rpgraph.onlyProducedSpecies(True, False),
                               ['TARGET_0000000001__64__MNXC3'])
+
+    def test_edgesStoichiometry(self):
+        for reac_id, reac in self.rpsbml.readRPspecies().items():
+            for spe_id, stoichio in reac['reactants'].items():
+                self.assertEqual(self.rpgraph.G.edges[spe_id, reac_id]['stoichio'], stoichio)
+            for spe_id, stoichio in reac['products'].items():
+                self.assertEqual(self.rpgraph.G.edges[reac_id, spe_id]['stoichio'], stoichio)
+
+    def test_orderedRetroReactions(self):
+        self.assertEqual(self.rpgraph.orderedRetroReactions(),
+                         [['RP3'], ['RP2'], ['RP1']])
+        # none of the sink species links two reactions, the steps cannot be ordered from them
+        rpgraph = rpGraph(self.rpsbml, central_species_group_id='rp_sink_species')
+        with self.assertLogs('brs_libs.rpGraph', level='WARNING'):
+            self.assertEqual(rpgraph.orderedRetroReactions(), [])
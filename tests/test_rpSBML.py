@@ -6,11 +6,13 @@ Created on June 17 2020
 
 from _main    import Main
 from unittest import TestCase
+from unittest.mock import patch
 from brs_libs import rpSBML
 from os       import path     as os_path
 from json     import load     as json_load
 from tempfile import NamedTemporaryFile
 from io       import open     as io_open
+import libsbml
 
 
 class Test_rpSBML(TestCase):
@@ -48,6 +50,29 @@ class Test_rpSBML(TestCase):
         rpsbml  = rpSBML()
         self.assertEqual(rpsbml.getName(), 'dummy')
 
+    def test_readSBMLNonFatalError(self):
+        # the reading errors that are not fatal are logged and the model is still loaded
+        with NamedTemporaryFile(suffix='.xml') as tempf:
+            with open(tempf.name, 'w') as f:
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<sbml xmlns="http://www.sbml.org/sbml/level3/version1/core" level="3" version="1">'
+                        '<model id="rpSBML_test" sboTerm="SBO:000000x"/></sbml>\n')
+            rpsbml = rpSBML()
+            with self.assertLogs('brs_libs.rpSBML', level='WARNING'):
+                rpsbml.readSBML(tempf.name)
+        self.assertEqual(rpsbml.getModel().getId(), 'rpSBML_test')
+
+    def test_readSBMLFatalError(self):
+        # libSBML only reports fatal errors for internal failures, one is logged on a valid document
+        inFile   = os_path.join(os_path.dirname(__file__), 'data', 'rpsbml.xml')
+        document = libsbml.readSBMLFromFile(inFile)
+        document.getErrorLog().logError(libsbml.InternalXMLParserError)
+        rpsbml   = rpSBML()
+        with patch.object(rpSBML, '_READER') as reader:
+            reader.readSBMLFromFile.return_value = document
+            with self.assertRaises(FileNotFoundError):
+                rpsbml.readSBML(inFile)
+
     def test_score(self):
         self.rpsbml.compute_score()
         self.assertEqual(self.rpsbml.getScore(), self.rpsbml_score)
@@ -125,6 +150,22 @@ class Test_rpSBML(TestCase):
             self.rpsbml.getModel().getSpecies('MNXM89557__64__MNXC3').getAnnotation(),
             self.rpsbml.getModel().getSpecies('CMPD_0000000013__64__MNXC3').getAnnotation()))
 
+    def test_compareReaction(self):
+        # the products of the source reaction are compared with the products of the target one
+        self.assertTupleEqual(rpSBML.compareReaction({},
+                                                     self.rpsbml.getModel().getReaction('RP1'),
+                                                     self.rpsbml.getModel().getReaction('RP1')),
+                              (1.0, True))
+        self.assertFalse(rpSBML.compareReaction({},
+                                                self.rpsbml.getModel().getReaction('RP1'),
+                                                self.rpsbml.getModel().getReaction('RP2'))[1])
+        # a target reaction that contains the source one but has an extra product is not the same
+        target_reaction = self.rpsbml.getModel().getReaction('RP1').clone()
+        target_reaction.createProduct().setSpecies('MNXM1__64__MNXC3')
+        self.assertFalse(rpSBML.compareReaction({},
+                                                self.rpsbml.getModel().getReaction('RP1'),
+                                                target_reaction)[1])
+
     def test_createReturnFluxParameter(self):
         #return feature
         param = self.rpsbml.createReturnFluxParameter(None, parameter_id='B_999999')